@@ -0,0 +1,209 @@
+import re
+import threading
+import time
+
+from .tql import TQL
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains classes for replaying a TQL workload against a cluster and measuring how it performs.
+"""
+
+# Prompts that start the lines with statements in rtql and TQL session logs.
+PROMPT_PATTERN = re.compile(r"^\s*(?:rtql \[database=[^\]]*\] > |TQL \[database=[^\]]*\]> |\$> )")
+
+
+def read_statements(lines):
+    """
+    Reads the statements from a script or a log of an rtql or TQL session.  If any line starts with a prompt, only
+    the lines with prompts are used, otherwise all lines are.  Blank lines and comments are skipped and statements
+    can span lines until they end with a semicolon.
+    :param lines: The lines of the script or log.
+    :type lines: iterable of str
+    :return: The statements.
+    :rtype: list of str
+    """
+    lines = [line.rstrip("\n") for line in lines]
+    is_log = any(PROMPT_PATTERN.match(line) for line in lines)
+
+    statements = []
+    statement = ""
+    for line in lines:
+        if is_log:
+            m = PROMPT_PATTERN.match(line)
+            if not m:
+                continue  # output from the statement.
+            line = line[m.end():]
+
+        line = line.strip()
+        if not line or line.startswith(("--", "#")):
+            continue
+
+        statement = f"{statement} {line}" if statement else line
+        if statement.endswith(";"):
+            statements.append(statement)
+            statement = ""
+
+    if statement:
+        statements.append(statement + ";")
+
+    return statements
+
+
+def statement_type(statement):
+    """
+    Returns the type of a statement, which is the first word, e.g. SELECT.
+    :param statement: The statement.
+    :type statement: str
+    :return: The type in upper case.
+    :rtype: str
+    """
+    words = statement.split(None, 1)
+    return words[0].rstrip(";").upper() if words else ""
+
+
+class BenchResults:
+    """
+    Collects the latency and errors for each statement that was run.  Can be updated from several threads.
+    """
+
+    def __init__(self):
+        """
+        Creates new, empty results.
+        """
+        self._lock = threading.Lock()
+        self._latencies = {}  # statement type -> list of seconds
+        self._errors = {}  # statement type -> number of errors
+        self.start = None
+        self.end = None
+
+    def add(self, statement_type, latency, error=False):
+        """
+        Records a statement that was run.
+        :param statement_type: The type of statement, e.g. SELECT.
+        :type statement_type: str
+        :param latency: The seconds the statement took.
+        :type latency: float
+        :param error: True if the statement failed.
+        :type error: bool
+        """
+        with self._lock:
+            self._latencies.setdefault(statement_type, []).append(latency)
+            if error:
+                self._errors[statement_type] = self._errors.get(statement_type, 0) + 1
+
+    def get_summary(self):
+        """
+        Returns the statistics for each type of statement and for all statements.
+        :return: A dictionary for each statement type, plus "ALL", with the count, errors, error_rate, throughput
+        (statements per second) and the p50, p90, p99 and max latency in seconds.
+        :rtype: dict of str to dict
+        """
+        with self._lock:
+            latencies = {key: list(values) for key, values in self._latencies.items()}
+            errors = dict(self._errors)
+
+        latencies["ALL"] = [latency for values in latencies.values() for latency in values]
+        errors["ALL"] = sum(errors.values())
+        elapsed = (self.end or time.time()) - (self.start or time.time())
+
+        summary = {}
+        for key, values in latencies.items():
+            values.sort()
+            count = len(values)
+            summary[key] = {
+                "count": count,
+                "errors": errors.get(key, 0),
+                "error_rate": errors.get(key, 0) / count if count else 0.0,
+                "throughput": count / elapsed if elapsed > 0 else 0.0,
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": values[-1] if values else 0.0,
+            }
+
+        return summary
+
+
+def percentile(values, percent):
+    """
+    Returns a percentile of sorted values using the nearest rank.
+    :param values: The sorted values.
+    :type values: list of float
+    :param percent: The percentile, from 0 to 100.
+    :type percent: float
+    :return: The value at the percentile, or 0 if there are no values.
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * percent // 100))  # ceiling
+    return values[int(rank) - 1]
+
+
+def replay(statements, session_factory, sessions=1, rate=None, repeat=1):
+    """
+    Replays statements with several concurrent sessions.  Each session runs the statements in order, so statements
+    like "use" apply to the statements after them.  With a rate, latency is measured from when each statement was
+    scheduled to start, so time spent waiting behind slow statements is included rather than hidden.
+    :param statements: The statements to run.
+    :type statements: list of str
+    :param session_factory: Called with no arguments to create each session, e.g. a TQL or RemoteTQL.  Sessions
+    need a run_tql_command method, which should raise an exception for errors or return TQL's error message with the
+    output, like RemoteTQL does in an interactive shell.
+    :param sessions: The number of concurrent sessions.
+    :type sessions: int
+    :param rate: The target number of statements per second across all sessions.  As fast as possible if not set.
+    :type rate: float
+    :param repeat: The number of times each session runs the statements.
+    :type repeat: int
+    :return: The results.
+    :rtype: BenchResults
+    """
+    results = BenchResults()
+    schedule_lock = threading.Lock()
+    next_slot = [0]  # statements scheduled so far, shared by the sessions.
+    clients = [session_factory() for _ in range(sessions)]  # connect before timing starts.
+
+    def run_session(client):
+        for _ in range(repeat):
+            for statement in statements:
+                if rate:
+                    with schedule_lock:
+                        slot = next_slot[0]
+                        next_slot[0] += 1
+                    scheduled = results.start + slot / rate
+                    delay = scheduled - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                start = scheduled if rate else time.time()  # includes any time spent behind schedule.
+                try:
+                    output = client.run_tql_command(statement)
+                    error = any(TQL.ERROR_TEXT in line for line in output or [])
+                except Exception:
+                    error = True
+                results.add(statement_type(statement), time.time() - start, error=error)
+
+    threads = [threading.Thread(target=run_session, args=(client,)) for client in clients]
+    results.start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.end = time.time()
+
+    return results
@@ -0,0 +1,171 @@
+import re
+import threading
+
+from .tql import RemoteTQL
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains a wrapper that coalesces identical concurrent queries into a single execution.
+"""
+
+
+class _InFlightCall:
+    """
+    Tracks a single call that is currently executing so that other callers can wait on it.
+    """
+
+    def __init__(self):
+        """
+        Creates a new in flight call.
+        """
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class CoalescingTQL:
+    """
+    Wraps a TQL (or RemoteTQL) object that is shared between threads.  When a query is already running for the same
+    database, later callers wait for the first call to finish and get the same result instead of sending the query
+    to the cluster again.  Results are only shared between calls that overlap, nothing is cached.
+    """
+
+    QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")  # quoted literals and identifiers.
+
+    def __init__(self, tql, serialize=None):
+        """
+        Creates a new coalescing wrapper.
+        :param tql: The TQL object to send queries to.
+        :type tql: TQL
+        :param serialize: If True, only one query at a time is sent to the wrapped object.  By default this is True
+        for RemoteTQL, which sends everything over a single SSH channel, and False for TQL, which runs a separate
+        process for each query.
+        :type serialize: bool
+        """
+        if serialize is None:
+            serialize = isinstance(tql, RemoteTQL)
+
+        self._tql = tql
+        self._lock = threading.Lock()  # protects the in flight calls and metrics.
+        self._execute_lock = threading.Lock() if serialize else None
+        self._in_flight = {}  # key -> _InFlightCall
+
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+
+    def execute_tql_query(self, query, **kwargs):
+        """
+        Executes a TQL query and returns the data as a data table.  Callers that coalesce onto the same execution
+        share the same table, so it should be treated as read only.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param kwargs: Any other arguments to pass to execute_tql_query.
+        :return: A data table with the results.
+        :rtype: DataTable
+        """
+        key = ("execute_tql_query", self._get_database(), self._normalize(query), tuple(sorted(kwargs.items())))
+        return self._call(key, self._tql.execute_tql_query, query, **kwargs)
+
+    def get_databases(self):
+        """
+        Returns a list of the databases.
+        :return: A list of all the database commands.
+        :rtype: list of str
+        """
+        return list(self._call(("get_databases",), self._tql.get_databases))
+
+    def get_metrics(self):
+        """
+        Returns the counts of calls made to this object.
+        :return: A dictionary with the number of calls, the number of calls sent to TQL, the number of calls that
+        waited on another call, and the number of calls in flight.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+    def _get_database(self):
+        """
+        Returns the database the wrapped object is using, if it tracks one.
+        :return: The name of the database or None.
+        :rtype: str
+        """
+        return getattr(self._tql, "database", None)
+
+    @staticmethod
+    def _normalize(query):
+        """
+        Normalizes a query so that trivial differences don't prevent coalescing.  Whitespace is only collapsed
+        outside of quoted literals, since the spacing inside a literal changes the query.
+        :param query: The query to normalize.
+        :type query: str
+        :return: The normalized query.
+        :rtype: str
+        """
+        parts = CoalescingTQL.QUOTED.split(query.strip().rstrip(";"))
+        # the literals are at the odd indexes.
+        return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)).strip()
+
+    def _call(self, key, function, *args, **kwargs):
+        """
+        Runs the function for the key, or waits for the call already running for the key.
+        :param key: Identifies calls that can share a result.
+        :type key: tuple
+        :param function: The function to call if nothing is in flight for the key.
+        :return: The result of the function.
+        :raises: Any exception raised by the function.
+        """
+        with self._lock:
+            self._calls += 1
+            call = self._in_flight.get(key)
+            if call:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._in_flight[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            if self._execute_lock:
+                with self._execute_lock:
+                    call.result = function(*args, **kwargs)
+            else:
+                call.result = function(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+        return call.result
@@ -0,0 +1,579 @@
+import hashlib
+import hmac
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import paramiko
+
+from .model import DataTable
+from .tql import RemoteTQL, ResultTooLargeError, TQL, TQLError
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains a local daemon that keeps remote TQL sessions open and a client for talking to it.  The daemon
+listens on a Unix socket and messages are sent as one JSON object per line.  This only works on Unix systems.
+"""
+
+# The socket is in a directory only the user can use, so other users can't listen in place of the daemon.
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or os.path.expanduser("~/.rtql"), "rtqld.sock")
+DEFAULT_KEEPALIVE = 30  # seconds between SSH keepalives and session checks.
+
+# Errors that mean the SSH session needs to be reopened.
+CONNECTION_ERRORS = (paramiko.ssh_exception.SSHException, socket.error, EOFError)
+
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon reports an error running a request.
+    """
+    pass
+
+
+class _Session:
+    """
+    A remote TQL session kept open by the daemon.  Only one command at a time is sent to a session.
+    """
+
+    def __init__(self, hostname, username, password, keepalive):
+        """
+        Opens a new session.
+        :param hostname: IP or host name for ThoughtSpot.
+        :type hostname: str
+        :param username: The user to log in as.
+        :type username: str
+        :param password: The password for the user.
+        :type password: str
+        :param keepalive: Seconds between SSH keepalives.
+        :type keepalive: int
+        """
+        self.hostname = hostname
+        self.username = username
+        self.password_hash = _hash_password(password)
+        self.lock = threading.Lock()
+
+        self._password = password
+        self._keepalive = keepalive
+        self.tql = self._connect()
+
+    def _connect(self):
+        """
+        Opens the SSH connection and starts TQL.
+        :return: The remote TQL session.
+        :rtype: RemoteTQL
+        """
+        return RemoteTQL(hostname=self.hostname, username=self.username, password=self._password,
+                         keepalive=self._keepalive)
+
+    def reconnect(self, database=None):
+        """
+        Replaces the session with a new one, switching back to the database that was in use.  Expects the lock to
+        be held.
+        :param database: The database to switch to instead of the one in use.  "none" leaves the new session without
+        a database.
+        :type database: str
+        """
+        database = database or self.tql.database
+        self.tql = self._connect()
+        if database and database != "none":
+            self.tql.run_tql_command(f"use {database};")
+
+    def run(self, command, database=None, max_rows=None, max_result_bytes=None):
+        """
+        Runs a complete statement for a client.  The lines of a statement that spans lines are sent one at a time,
+        as if they were typed, while the session is held for the client.
+        :param command: The statement to run.
+        :type command: str
+        :param database: The database the client is using.
+        :type database: str
+        :param max_rows: The most rows to keep before raising an error.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes to keep before raising an error.
+        :type max_result_bytes: int
+        :return: The data from the command as a list, and the database and prompt after the command.
+        :rtype: list of str, str, str
+        """
+        def run_lines(tql):
+            lines = command.split("\n")
+            for line in lines[:-1]:
+                tql.run_tql_command(line)  # TQL waits for the rest of the statement.
+            return tql.run_tql_command(lines[-1], max_rows=max_rows, max_result_bytes=max_result_bytes)
+
+        return self._call(run_lines, database=database)
+
+    def head(self, query, n, database=None):
+        """
+        Returns the first rows of a query for a client.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param n: The number of rows to return.
+        :type n: int
+        :param database: The database the client is using.
+        :type database: str
+        :return: A data table with up to n rows, and the database and prompt after the query.
+        :rtype: DataTable, str, str
+        """
+        return self._call(lambda tql: tql.head(query, n=n), database=database)
+
+    def _call(self, function, database=None):
+        """
+        Calls the function with the session after switching to the client's database.  If the connection was lost
+        before the command was sent, reconnects and tries once more.  If it was lost after, the command may have run,
+        so the error is raised rather than running it twice.
+        :param function: The function to call with the RemoteTQL object.
+        :param database: The database the client is using.  Other clients may have switched the session to another.
+        :type database: str
+        :return: The result of the function, and the database and prompt after it.
+        :rtype: any, str, str
+        """
+        with self.lock:
+            if not self.tql.is_active():
+                self.reconnect()
+            if database and self.tql.database != database:
+                self.tql.run_tql_command(f"use {database};")
+            elif not database and self.tql.database:
+                # TQL can't leave a database, so the client gets a new session that isn't in one.
+                self.reconnect(database="none")
+
+            sent = self.tql.get_metrics()["queries"]
+            try:
+                result = function(self.tql)
+            except CONNECTION_ERRORS:
+                not_sent = self.tql.get_metrics()["queries"] == sent
+                self.reconnect()
+                if not_sent:
+                    result = function(self.tql)
+                else:
+                    raise
+
+            return result, self.tql.database, self.tql.prompt
+
+    def check(self):
+        """
+        Reconnects if the connection has been dropped.  Sessions that are busy are skipped.
+        """
+        if self.lock.acquire(blocking=False):
+            try:
+                if not self.tql.is_active():
+                    self.reconnect()
+            finally:
+                self.lock.release()
+
+
+def _hash_password(password):
+    """
+    Hashes a password so that it can be compared without keeping it around for comparisons.
+    :param password: The password to hash.
+    :type password: str
+    :return: The hash of the password.
+    :rtype: bytes
+    """
+    return hashlib.sha256((password or "").encode("utf-8")).digest()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a single client connection.  The first request must be a connect, the rest are run against that session.
+    Each client keeps its own database, which the session is switched back to before the client's commands.  Lines of
+    a statement are kept for the client until the statement is complete, so they aren't mixed with other clients'.
+    """
+
+    def handle(self):
+        """
+        Reads requests until the client disconnects.
+        """
+        session = None
+        database = None  # the database this client is using.
+        prompt = None
+        partial = []  # lines of a statement that hasn't been completed with a semicolon.
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode("utf-8"))
+                action = request.get("action")
+                if action == "connect":
+                    session = self.server.tql_daemon.get_session(hostname=request["hostname"],
+                                                                 username=request.get("username"),
+                                                                 password=request.get("password"))
+                    with session.lock:
+                        # a new client starts in the database the session is in.
+                        database, prompt = session.tql.database, session.tql.prompt
+                    response = {}
+                elif action == "run":
+                    if not session:
+                        raise DaemonError("Not connected to a host.")
+                    if request["command"].strip():
+                        partial.append(request["command"].strip())
+                    statement = "\n".join(partial).strip()
+                    if statement and not statement.endswith(";"):
+                        lines, prompt = [], "$> "  # wait for the rest of the statement.
+                    else:
+                        partial = []
+                        lines = []
+                        if statement:
+                            lines, database, prompt = session.run(statement, database=database,
+                                                                  max_rows=request.get("max_rows"),
+                                                                  max_result_bytes=request.get("max_result_bytes"))
+                    response = {"lines": lines}
+                elif action == "head":
+                    if not session:
+                        raise DaemonError("Not connected to a host.")
+                    table, database, prompt = session.head(request["query"], n=request["n"], database=database)
+                    response = {"header": table.get_header(),
+                                "rows": [table.get_row(i).get_data() for i in range(table.nbr_rows())]}
+                elif action == "status":
+                    response = {"sessions": self.server.tql_daemon.get_status()}
+                elif action == "shutdown":
+                    self._send({"ok": True})
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                else:
+                    raise DaemonError(f"Unknown action {action}.")
+
+                response["ok"] = True
+                if session:
+                    response["prompt"] = prompt
+                    response["database"] = database
+            except Exception as e:
+                response = {"ok": False, "error": str(e), "type": type(e).__name__}
+
+            self._send(response)
+
+    def _send(self, response):
+        """
+        Sends a response to the client.
+        :param response: The response to send.
+        :type response: dict
+        """
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded Unix socket server that knows about the daemon it belongs to.
+    """
+    daemon_threads = True
+
+
+class TQLDaemon:
+    """
+    Keeps authenticated remote TQL sessions open, one per host and user, so that rtql and RemoteTQL can start
+    without opening a new SSH connection.  Clients that share a session each keep their own database.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, keepalive=DEFAULT_KEEPALIVE):
+        """
+        Creates a new daemon.
+        :param socket_path: The Unix socket to listen on.
+        :type socket_path: str
+        :param keepalive: Seconds between SSH keepalives and checks for dropped sessions.
+        :type keepalive: int
+        """
+        self.socket_path = socket_path
+        self.keepalive = keepalive
+
+        self._lock = threading.Lock()  # protects the sessions.
+        self._sessions = {}  # (hostname, username) -> _Session
+        self._connecting = {}  # (hostname, username) -> Lock held while the session is opened.
+        self._server = None
+
+    def get_session(self, hostname, username, password):
+        """
+        Returns the session for the host and user, opening one if needed.
+        :param hostname: IP or host name for ThoughtSpot.
+        :type hostname: str
+        :param username: The user to log in as.
+        :type username: str
+        :param password: The password for the user.  Must match the one used to open an existing session.
+        :type password: str
+        :return: The session.
+        :rtype: _Session
+        :raises: paramiko.ssh_exception.AuthenticationException if the password doesn't match.
+        """
+        key = (hostname, username)
+        with self._lock:
+            session = self._sessions.get(key)
+            connect_lock = self._connecting.setdefault(key, threading.Lock())
+
+        if not session:
+            # only clients for the same host and user wait while the session is opened.
+            with connect_lock:
+                with self._lock:
+                    session = self._sessions.get(key)
+                if not session:
+                    session = _Session(hostname=hostname, username=username, password=password,
+                                       keepalive=self.keepalive)
+                    with self._lock:
+                        self._sessions[key] = session
+
+        if not hmac.compare_digest(session.password_hash, _hash_password(password)):
+            raise paramiko.ssh_exception.AuthenticationException("Authentication failed.")
+
+        return session
+
+    def get_status(self):
+        """
+        Returns details about the open sessions.
+        :return: A list with the host, user, database and state of each session.
+        :rtype: list of dict
+        """
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [{"hostname": s.hostname, "username": s.username, "database": s.tql.database,
+                 "active": s.tql.is_active()} for s in sessions]
+
+    def serve_forever(self):
+        """
+        Listens for clients until shut down.  The socket is only accessible by the current user.
+        :raises: DaemonError if a daemon is already running.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), mode=0o700, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if is_running(self.socket_path):
+                raise DaemonError(f"A daemon is already listening on {self.socket_path}")
+            os.remove(self.socket_path)  # left over from a daemon that didn't shut down cleanly.
+
+        umask = os.umask(0o177)
+        try:
+            self._server = _UnixServer(self.socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self._server.tql_daemon = self
+
+        checker = threading.Thread(target=self._check_sessions, daemon=True)
+        checker.start()
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            os.remove(self.socket_path)
+
+    def shutdown(self):
+        """
+        Stops the daemon.
+        """
+        if self._server:
+            self._server.shutdown()
+
+    def _check_sessions(self):
+        """
+        Periodically reopens sessions that have been dropped.
+        """
+        while True:
+            time.sleep(self.keepalive)
+            with self._lock:
+                sessions = list(self._sessions.values())
+            for session in sessions:
+                try:
+                    session.check()
+                except CONNECTION_ERRORS:
+                    pass  # try again next time.
+
+
+def is_running(socket_path=DEFAULT_SOCKET):
+    """
+    Returns True if a daemon is listening on the socket.
+    :param socket_path: The Unix socket for the daemon.
+    :type socket_path: str
+    :return: True if a daemon is running.
+    :rtype: bool
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def connect_to_daemon(socket_path=DEFAULT_SOCKET):
+    """
+    Connects to the daemon and checks that it's run by the current user, so that passwords aren't sent to a process
+    run by someone else.
+    :param socket_path: The Unix socket for the daemon.
+    :type socket_path: str
+    :return: The connected socket.
+    :rtype: socket.socket
+    :raises: DaemonError if the daemon is run by another user.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        if hasattr(socket, "SO_PEERCRED"):
+            credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+            pid, uid, gid = struct.unpack("3i", credentials)
+        else:
+            uid = os.stat(socket_path).st_uid  # not as good, but SO_PEERCRED is Linux only.
+        if uid != os.getuid():
+            raise DaemonError(f"The daemon on {socket_path} is run by another user.")
+    except Exception:
+        sock.close()
+        raise
+
+    return sock
+
+
+def start_daemon(socket_path=DEFAULT_SOCKET, keepalive=DEFAULT_KEEPALIVE, timeout=10):
+    """
+    Starts the daemon in the background if it isn't already running.
+    :param socket_path: The Unix socket for the daemon.
+    :type socket_path: str
+    :param keepalive: Seconds between SSH keepalives.
+    :type keepalive: int
+    :param timeout: Seconds to wait for the daemon to start.
+    :type timeout: int
+    :raises: DaemonError if the daemon doesn't start.
+    """
+    if is_running(socket_path):
+        return
+
+    subprocess.Popen([sys.executable, "-m", "tql.rtqld", "--socket", socket_path, "--keepalive", str(keepalive)],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+    end = time.time() + timeout
+    while time.time() < end:
+        if is_running(socket_path):
+            return
+        time.sleep(0.05)
+
+    raise DaemonError(f"Daemon didn't start on {socket_path}")
+
+
+class DaemonTQL(RemoteTQL):
+    """
+    Provides remote access to TQL through a session kept open by TQLDaemon.  Works like RemoteTQL, but doesn't open
+    its own SSH connection.
+    """
+
+    def __init__(self, hostname, username=None, password=None, socket_path=DEFAULT_SOCKET):
+        """
+        Attaches to a session in the daemon, which opens it if needed.
+        :param hostname: IP or host name for ThoughtSpot.
+        :type hostname: str
+        :param username: The user to log in as.
+        :type username: str
+        :param password: The password for the user.
+        :type password: str
+        :param socket_path: The Unix socket for the daemon.
+        :type socket_path: str
+        """
+        self.prompt = None
+        self.database = None
+        self._set_prompt(database="none")
+        self.hostname = hostname
+        self._exec_mode = False  # the daemon's session handles how commands are run.
+        self._metrics = {"queries": 0, "wire_bytes": 0, "logical_bytes": 0}
+
+        self._socket = connect_to_daemon(socket_path)
+        self._file = self._socket.makefile("rwb")
+        self._request({"action": "connect", "hostname": hostname, "username": username, "password": password})
+
+        TQL.__init__(self)  # skips RemoteTQL, which would open its own connection.
+
+    def __del__(self):
+        """
+        Detaches from the daemon.  The session stays open for the next client.
+        :return: None
+        """
+        if getattr(self, "_socket", None):
+            self._file.close()
+            self._socket.close()
+
+    def is_active(self):
+        """
+        Returns True if still attached to the daemon.
+        :return: True if commands can still be sent.
+        :rtype: bool
+        """
+        return self._socket.fileno() != -1
+
+    def run_tql_command(self, command, max_rows=None, max_result_bytes=None):
+        """
+        Runs a command in TQL and returns the results as a list of strings.
+        :param command: The command to run.
+        :type command: str
+        :param max_rows: If set, raises an error if there are more rows than this.
+        :type max_rows: int
+        :param max_result_bytes: If set, raises an error if the result is larger than this.
+        :type max_result_bytes: int
+        :return: The data from the command as a list.
+        :rtype: list of str
+        :raises: TQLError, ResultTooLargeError
+        """
+        self._metrics["queries"] += 1
+        return self._request({"action": "run", "command": command, "max_rows": max_rows,
+                              "max_result_bytes": max_result_bytes})["lines"]
+
+    def head(self, query, n=10):
+        """
+        Executes a TQL query and returns only the first rows.  The daemon cancels the statement once the rows have
+        been read.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param n: The number of rows to return.
+        :type n: int
+        :return: A data table with up to n rows.
+        :rtype: DataTable
+        """
+        self._metrics["queries"] += 1
+        response = self._request({"action": "head", "query": query, "n": n})
+        return DataTable(header=response["header"], data=response["rows"])
+
+    def _request(self, request):
+        """
+        Sends a request to the daemon and waits for the response.
+        :param request: The request to send.
+        :type request: dict
+        :return: The response.
+        :rtype: dict
+        :raises: AuthenticationException or DaemonError if the request failed.
+        """
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("Connection to the daemon was closed.")
+        self._metrics["wire_bytes"] += len(line)
+        self._metrics["logical_bytes"] += len(line)
+        response = json.loads(line.decode("utf-8"))
+
+        if not response["ok"]:
+            if response["type"] == "AuthenticationException":
+                raise paramiko.ssh_exception.AuthenticationException(response["error"])
+            if response["type"] in ("timeout", "TimeoutError"):
+                raise socket.timeout(response["error"])
+            if response["type"] == "TQLError":
+                raise TQLError(response["error"])
+            if response["type"] == "ResultTooLargeError":
+                raise ResultTooLargeError(response["error"])
+            raise DaemonError(response["error"])
+
+        if response.get("prompt"):
+            self.prompt = response["prompt"]
+            self.database = response["database"]
+
+        return response
@@ -0,0 +1,90 @@
+import contextlib
+import tracemalloc
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains tools for finding out how much memory queries use.  They use tracemalloc, which slows Python
+down, so they are meant for diagnostics rather than normal use.
+"""
+
+
+class MemoryTrace:
+    """
+    The memory allocated while a trace was running.  Filled in when the trace ends.
+    """
+
+    def __init__(self):
+        """
+        Creates a new, empty trace.
+        """
+        self.current = 0  # bytes still allocated at the end of the trace.
+        self.peak = 0  # most bytes allocated at any time during the trace.
+        self._snapshot = None
+
+    def top(self, limit=10, key_type="lineno"):
+        """
+        Returns the places that allocated the most memory that was still in use at the end of the trace.
+        :param limit: The number of places to return.
+        :type limit: int
+        :param key_type: How to group allocations, e.g. "lineno" or "filename".
+        :type key_type: str
+        :return: The largest allocations.
+        :rtype: list of tracemalloc.Statistic
+        """
+        if not self._snapshot:
+            return []
+        return self._snapshot.statistics(key_type)[:limit]
+
+    def __str__(self):
+        """
+        Returns a pretty version to print.
+        :return: A summary of the trace.
+        :rtype: str
+        """
+        lines = [f"current: {self.current} bytes, peak: {self.peak} bytes"]
+        lines.extend(str(stat) for stat in self.top())
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def trace_memory(frames=1):
+    """
+    Traces the memory allocated in a block, e.g.
+      with trace_memory() as trace:
+          table = tql.execute_tql_query("SELECT * FROM foo;")
+      print(trace)
+    :param frames: The number of stack frames to keep for each allocation.
+    :type frames: int
+    :return: The trace, which is filled in when the block ends.
+    :rtype: MemoryTrace
+    """
+    trace = MemoryTrace()
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    if hasattr(tracemalloc, "reset_peak"):  # added in Python 3.9.
+        tracemalloc.reset_peak()
+    start_current, _ = tracemalloc.get_traced_memory()
+    try:
+        yield trace
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        trace.current = current - start_current
+        trace.peak = peak - start_current
+        trace._snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+        if started:
+            tracemalloc.stop()
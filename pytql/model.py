@@ -1,3 +1,10 @@
+import io
+import sys
+from array import array
+
+from .render import ALIGNED, PIPE, render
+from .stats import TableStats
+
 """
 Copyright 2018 ThoughtSpot
 Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
@@ -129,40 +136,247 @@ class Row:
         return self.get_column(key)
 
 
+class DictionaryColumn:
+    """
+    Stores the values of a column as a list of the unique values and an array of integer codes into that list.  This
+    uses much less memory than a list of values when there are few unique values, and lets filters and groupings
+    compare codes instead of values.  The codes use the smallest integer type that can hold them.  Values are only
+    the same if they have the same type, so 1, 1.0 and True are kept as different values.
+    """
+
+    def __init__(self, values=None):
+        """
+        Creates a new column.
+        :param values: Optional values to add to the column.
+        :type values: list
+        """
+        self.values = []  # the unique values, in the order they were first seen.
+        self.codes = array("B")  # index into values for each row.
+        self._index = {}  # (type, value) -> code
+
+        for value in values or []:
+            self.append(value)
+
+    def append(self, value):
+        """
+        Adds a value to the end of the column.
+        :param value: The value to add.  Must be hashable.
+        :raises: TypeError if the value isn't hashable.
+        """
+        key = (type(value), value)
+        code = self._index.get(key)
+        if code is None:
+            code = len(self.values)
+            if code >= 2 ** (8 * self.codes.itemsize):
+                self.codes = array(_CODE_TYPES[self.codes.typecode], self.codes)  # use a larger code.
+            self._index[key] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def code_for(self, value):
+        """
+        Returns the code for a value.
+        :param value: The value to look up.
+        :return: The code or None if the value isn't in the column.
+        :rtype: int
+        """
+        return self._index.get((type(value), value))
+
+    def cardinality(self):
+        """
+        Returns the number of unique values.
+        :return: The number of unique values.
+        :rtype: int
+        """
+        return len(self.values)
+
+    def __getitem__(self, index):
+        """
+        Returns the value for a row.
+        :param index: The row number.
+        :type index: int
+        :return: The value.
+        """
+        return self.values[self.codes[index]]
+
+    def __iter__(self):
+        """
+        Returns the values in row order.
+        :return: An iterator over the values.
+        """
+        values = self.values
+        return (values[code] for code in self.codes)
+
+    def __len__(self):
+        """
+        Returns the number of rows.
+        :return: The number of rows.
+        """
+        return len(self.codes)
+
+
+# The next larger array type for codes when a dictionary gets too big for the current one.
+_CODE_TYPES = {"B": "H", "H": "I", "I": "L", "L": "Q"}
+
+
 class DataTable:
     """
-    Represents a table of data in TQL.  In contrast to the table with metadata.
+    Represents a table of data in TQL.  In contrast to the table with metadata.  Data is stored by column.  Columns
+    with few unique values are dictionary encoded (see DictionaryColumn), the rest are stored as lists.
     """
 
-    def __init__(self, header=None, data=None):
+    # Columns start dictionary encoded and are changed to lists once they have at least DICTIONARY_MIN_ROWS rows and
+    # more than DICTIONARY_MAX_RATIO unique values per row.
+    DICTIONARY_MIN_ROWS = 1000
+    DICTIONARY_MAX_RATIO = 0.5
+
+    # The columns of the table returned by describe().
+    DESCRIBE_HEADER = ["column", "count", "nulls", "distinct", "min", "max", "mean", "p25", "p50", "p75"]
+
+    def __init__(self, header=None, data=None, stats=False):
         """
         Creates a new table for holding data.
         :param header: List of names for the columns.  Can be used to retrieve specific columns.
         :type header: list of str
         :param data: An optional list of lists of the data.  All columns must be present in each row.
         :type data: list of list
+        :param stats: If True, column statistics are updated as rows are added, so describe() doesn't need to read
+        the table again.
+        :type stats: bool
         """
         self._header = []  # list of column names
-        self._rows = []    # list of Rows
+        self._columns = []  # list of DictionaryColumn or list, one per column.
+        self._nbr_rows = 0
+        self._read_only = False
+        self._stats = None  # TableStats if they are updated as rows are added.
 
         self.__iter_index = 0
 
         if header:
             assert isinstance(header, list)  # just to be sure no weird errors happen later.
             self._header = list(header)
+            self._columns = [DictionaryColumn() for _ in self._header]
+
+        if stats:
+            self._stats = TableStats(header=self._header)
 
         if data:
             assert isinstance(data, list)  # just to be sure no weird errors happen later.
             for row in data:
-                self._rows.append(Row(header=self._header, data=row))
+                self.add_row(row)
 
     def add_row(self, row):
         """
         Adds a row of data.
         :param row: The row to add.
         :type row: list
+        :raises: ValueError if the number of columns doesn't match the header or the table is read only.
+        """
+        if self._read_only:
+            raise ValueError("Can't add rows to a read only table.")
+        if not self._columns and not self._header and self._nbr_rows == 0:
+            self._columns = [DictionaryColumn() for _ in row]  # no header, so the first row sets the columns.
+        if len(row) != len(self._columns):
+            raise ValueError(f"Number of columns in header and data row don't match.\n"
+                             f"  header:  {self._header}\n  data:  {row}")
+
+        self._nbr_rows += 1
+        for index, value in enumerate(row):
+            column = self._columns[index]
+            if isinstance(column, DictionaryColumn):
+                try:
+                    column.append(value)
+                except TypeError:
+                    column = self._decode_column(index)  # not hashable.
+                    column.append(value)
+                    continue
+
+                if self._nbr_rows >= DataTable.DICTIONARY_MIN_ROWS and \
+                        column.cardinality() > self._nbr_rows * DataTable.DICTIONARY_MAX_RATIO:
+                    self._decode_column(index)
+            else:
+                column.append(value)
+
+        if self._stats is not None:
+            self._stats.add_row(row)
+
+    @classmethod
+    def _from_columns(cls, header, columns, nbr_rows, read_only=False):
+        """
+        Creates a table from existing columns.
+        :param header: List of names for the columns.
+        :type header: list of str
+        :param columns: The columns, as DictionaryColumn or list-like objects.
+        :type columns: list
+        :param nbr_rows: The number of rows in each column.
+        :type nbr_rows: int
+        :param read_only: If True, rows can't be added.
+        :type read_only: bool
+        :return: The new table.
+        :rtype: DataTable
+        """
+        table = cls(header=header)
+        table._columns = columns
+        table._nbr_rows = nbr_rows
+        table._read_only = read_only
+        return table
+
+    def to_shared(self, name=None):
+        """
+        Copies the table into shared memory so that other processes can use it with DataTable.attach() without
+        pickling it.  All values must be text.  Requires Python 3.8 or later.
+        :param name: Optional name for the shared memory.  A unique name is created if not given.
+        :type name: str
+        :return: The shared memory, which must be unlinked when no longer needed, e.g. with a with block.
+        :rtype: pytql.shared.SharedDataTable
+        :raises: TypeError if a value isn't text.
+        """
+        from .shared import to_shared  # shared imports this module.
+        return to_shared(self, name=name)
+
+    @staticmethod
+    def attach(name):
+        """
+        Returns a read only table that reads from a table put in shared memory with to_shared().  Nothing is copied
+        except the unique values of dictionary encoded columns.
+        :param name: The name of the shared memory.
+        :type name: str
+        :return: The table.
+        :rtype: DataTable
+        """
+        from .shared import attach  # shared imports this module.
+        return attach(name)
+
+    def _decode_column(self, index):
+        """
+        Changes a dictionary encoded column into a list of values.
+        :param index: The column number.
+        :type index: int
+        :return: The new column.
+        :rtype: list
+        """
+        column = list(self._columns[index])
+        self._columns[index] = column
+        return column
+
+    def is_dictionary_encoded(self, column):
+        """
+        Returns True if the column is dictionary encoded.
+        :param column: Either an index (int, zero-based) or column name (str)
+        :type column: str or int
+        :return: True if the column is dictionary encoded.
+        :rtype: bool
+        :raises: ValueError
+        """
+        return isinstance(self._columns[self._column_index(column)], DictionaryColumn)
+
+    def get_header(self):
+        """
+        Returns the names of the columns.
+        :return: The names of the columns as a mutable list (will not change this table).
+        :rtype: list of str
         """
-        return self._rows.append(Row(header=self._header, data=row))
+        return list(self._header)
 
     def get_row(self, row_number):
         """
@@ -171,9 +385,14 @@ class DataTable:
         :type row_number: int
         :return: The row of data for the given row number.
         :rtype: Row
-        :raises: ValueError if the row_number is invalid.
+        :raises: IndexError if the row_number is invalid.
         """
-        return self._rows[row_number]
+        if row_number < 0:
+            row_number += self._nbr_rows
+        if row_number < 0 or row_number >= self._nbr_rows:
+            raise IndexError(f"Invalid row {row_number} for table.")
+
+        return Row(header=self._header, data=[column[row_number] for column in self._columns])
 
     def get_column(self, column):
         """
@@ -184,11 +403,120 @@ class DataTable:
         :rtype: str
         :raises: ValueError
         """
-        ret_column = []
-        for row in self:
-            ret_column.append(row.get_column(column))
+        return list(self._columns[self._column_index(column)])
+
+    def _column_index(self, column):
+        """
+        Returns the index of a column.
+        :param column: Either an index (int, zero-based) or column name (str)
+        :type column: str or int
+        :return: The index of the column.
+        :rtype: int
+        :raises: ValueError
+        """
+        index = -1
+        if isinstance(column, int):
+            index = column
+        if isinstance(column, str):
+            try:
+                index = self._header.index(column)
+            except ValueError:
+                pass  # handled below
+
+        if index < 0 or index >= len(self._columns):
+            raise ValueError(f"Invalid column {column} for table.")
+
+        return index
+
+    def filter_equals(self, column, value):
+        """
+        Returns the rows where a column has a given value.  Dictionary encoded columns are filtered by comparing codes.
+        :param column: Either an index (int, zero-based) or column name (str)
+        :type column: str or int
+        :param value: The value to match.
+        :return: A new table with the matching rows.
+        :rtype: DataTable
+        :raises: ValueError
+        """
+        data = self._columns[self._column_index(column)]
+        if isinstance(data, DictionaryColumn):
+            codes = {code for code, v in enumerate(data.values) if v == value}  # e.g. 1 also matches 1.0.
+            row_numbers = [i for i, c in enumerate(data.codes) if c in codes]
+        else:
+            row_numbers = [i for i, v in enumerate(data) if v == value]
+
+        return self._take(row_numbers)
+
+    def group_by(self, column):
+        """
+        Groups the rows by the values of a column.  Dictionary encoded columns are grouped by their codes.
+        :param column: Either an index (int, zero-based) or column name (str)
+        :type column: str or int
+        :return: A new table for each value, in the order the values were first seen.
+        :rtype: dict of value to DataTable
+        :raises: ValueError
+        """
+        return {value: self._take(row_numbers) for value, row_numbers in self._group_rows(column).items()}
+
+    def value_counts(self, column):
+        """
+        Counts the rows for each value of a column.  Dictionary encoded columns are counted by their codes.
+        :param column: Either an index (int, zero-based) or column name (str)
+        :type column: str or int
+        :return: The number of rows for each value, in the order the values were first seen.
+        :rtype: dict of value to int
+        :raises: ValueError
+        """
+        data = self._columns[self._column_index(column)]
+        if isinstance(data, DictionaryColumn):
+            code_counts = [0] * data.cardinality()
+            for code in data.codes:
+                code_counts[code] += 1
+            counts = {}
+            for value, count in zip(data.values, code_counts):
+                counts[value] = counts.get(value, 0) + count  # values like 1 and 1.0 are counted together.
+            return counts
 
-        return ret_column
+        counts = {}
+        for value in data:
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def _group_rows(self, column):
+        """
+        Returns the row numbers for each value of a column.
+        :param column: Either an index (int, zero-based) or column name (str)
+        :type column: str or int
+        :return: The row numbers for each value.
+        :rtype: dict of value to list of int
+        """
+        data = self._columns[self._column_index(column)]
+        if isinstance(data, DictionaryColumn):
+            code_groups = {}
+            for value in data.values:
+                code_groups.setdefault(value, [])  # values like 1 and 1.0 share a group.
+            groups = [code_groups[value] for value in data.values]
+            for row_number, code in enumerate(data.codes):
+                groups[code].append(row_number)
+            return code_groups
+
+        groups = {}
+        for row_number, value in enumerate(data):
+            groups.setdefault(value, []).append(row_number)
+        return groups
+
+    def _take(self, row_numbers):
+        """
+        Returns a new table with the given rows.
+        :param row_numbers: The rows to copy.
+        :type row_numbers: list of int
+        :return: A new table.
+        :rtype: DataTable
+        """
+        table = DataTable(header=self._header)
+        for row_number in row_numbers:
+            table.add_row([column[row_number] for column in self._columns])
+        return table
 
     def nbr_columns(self):
         """
@@ -204,7 +532,80 @@ class DataTable:
         :return: The number of rows.
         :rtype int:
         """
-        return len(self._rows)
+        return self._nbr_rows
+
+    def get_stats(self):
+        """
+        Returns the statistics for each column.  If they weren't updated as rows were added, they are computed with
+        one pass over each column.
+        :return: The statistics for the table.
+        :rtype: TableStats
+        """
+        if self._stats is not None:
+            return self._stats
+
+        stats = TableStats(header=self._header or [str(index) for index in range(len(self._columns))])
+        stats.nbr_rows = self._nbr_rows
+        for column_stats, column in zip(stats.columns, self._columns):
+            for value in column:
+                column_stats.add(value)
+        return stats
+
+    def describe(self):
+        """
+        Returns a summary of each column: the number of values and nulls, the estimated number of distinct values,
+        the smallest and largest values and, for numeric columns, the mean and the estimated quartiles.
+        :return: A table with a row for each column, see DESCRIBE_HEADER.
+        :rtype: DataTable
+        """
+        table = DataTable(header=DataTable.DESCRIBE_HEADER)
+        for summary in self.get_stats().summary():
+            table.add_row([_format_stat(summary[name]) for name in DataTable.DESCRIBE_HEADER])
+        return table
+
+    def memory_usage(self, deep=True):
+        """
+        Returns an estimate of the memory used by the table in bytes.
+        :param deep: If True, includes the memory of the values themselves, not just the references to them.
+        :type deep: bool
+        :return: A dictionary with the bytes used by each column ("columns"), by the kind of structure holding the
+        values ("structures": "codes", "dictionaries" and "lists"), by the header ("header"), by the table itself
+        ("table") and the total ("total").
+        :rtype: dict
+        """
+        columns = {}
+        structures = {"codes": 0, "dictionaries": 0, "lists": 0}
+        for index, column in enumerate(self._columns):
+            name = self._header[index] if index < len(self._header) else index
+            if isinstance(column, DictionaryColumn):
+                codes = sys.getsizeof(column.codes)
+                dictionary = sys.getsizeof(column) + sys.getsizeof(column.__dict__) + \
+                    sys.getsizeof(column.values) + sys.getsizeof(column._index)
+                if deep:
+                    dictionary += sum(sys.getsizeof(value) for value in column.values)
+                structures["codes"] += codes
+                structures["dictionaries"] += dictionary
+                columns[name] = codes + dictionary
+            else:
+                values = sys.getsizeof(column)
+                if deep:
+                    values += sum(sys.getsizeof(value) for value in column)
+                structures["lists"] += values
+                columns[name] = values
+
+        header = sys.getsizeof(self._header)
+        if deep:
+            header += sum(sys.getsizeof(name) for name in self._header)
+
+        table = sys.getsizeof(self) + sys.getsizeof(self.__dict__) + sys.getsizeof(self._columns)
+
+        return {
+            "columns": columns,
+            "structures": structures,
+            "header": header,
+            "table": table,
+            "total": sum(columns.values()) + header + table,
+        }
 
     def __repr__(self):
         """
@@ -220,27 +621,65 @@ class DataTable:
         :return: A printable representation of the data.
         :rtype: str
         """
-        result = "|".join(self._header)
-        result += "\n"
-        for row in self._rows:
-            result += str(row) + "\n"
+        buffer = io.StringIO()
+        self.render(buffer)
+        return buffer.getvalue()
+
+    def render(self, out, mode=PIPE, sample_size=None):
+        """
+        Writes the table to a file object a chunk at a time, so large tables don't need to be built as one string.
+        :param out: The file object to write to, e.g. sys.stdout.
+        :param mode: PIPE to separate values with |, or ALIGNED to pad the values so the columns line up.
+        :type mode: str
+        :param sample_size: In ALIGNED mode, the number of rows used to find the column widths.  If None, the widths
+        come from all of the values, which only looks at the unique values of dictionary encoded columns.
+        :type sample_size: int
+        """
+        widths = None
+        if mode == ALIGNED and sample_size is None:
+            widths = self._column_widths()
+        render(zip(*self._columns), out, header=self._header, mode=mode, widths=widths, sample_size=sample_size)
 
-        return result
+    def _column_widths(self):
+        """
+        Returns the width of the widest value in each column, including the column name.
+        :return: The width of each column.
+        :rtype: list of int
+        """
+        widths = []
+        for name, column in zip(self._header, self._columns):
+            values = column.values if isinstance(column, DictionaryColumn) else column
+            widths.append(max(len(name), max(map(len, values), default=0)))
+        return widths
 
     def __iter__(self):
         """
         Defines an iterator for this class.
-        :return: This object as an interator.
+        :return: An iterator over the rows.
         """
-        return self
+        return (self.get_row(row_number) for row_number in range(self._nbr_rows))
 
     def __next__(self):
         """
         Returns the next row of data.
         :return: The next row of data.
         """
-        if self.__iter_index >= len(self._rows):
+        if self.__iter_index >= self._nbr_rows:
             raise StopIteration()
 
         self.__iter_index += 1
-        return self._rows[self.__iter_index - 1]
+        return self.get_row(self.__iter_index - 1)
+
+
+def _format_stat(value):
+    """
+    Formats a statistic for describe().
+    :param value: The statistic.
+    :return: The statistic as a string, empty for None.
+    :rtype: str
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
@@ -0,0 +1,126 @@
+import itertools
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains functions for writing rows of data to a file object in chunks, so that large results start
+showing up right away and don't have to be built as one string.
+"""
+
+PIPE = "pipe"  # values separated by the separator, the same as TQL.
+ALIGNED = "aligned"  # values padded so the columns line up.
+
+CHUNK_LINES = 1000  # number of lines written at a time.
+SAMPLE_SIZE = 1000  # number of rows used to find the column widths when they aren't given.
+
+
+def write_lines(lines, out, chunk_lines=CHUNK_LINES):
+    """
+    Writes lines to a file object, a chunk at a time.
+    :param lines: The lines to write, without line endings.
+    :type lines: iterable of str
+    :param out: The file object to write to.
+    :param chunk_lines: The number of lines to write at a time.
+    :type chunk_lines: int
+    """
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, chunk_lines))
+        if not chunk:
+            break
+        chunk.append("")  # for the final line ending.
+        out.write("\n".join(chunk))
+
+
+def render(rows, out, header=None, mode=PIPE, separator="|", widths=None, sample_size=SAMPLE_SIZE,
+           chunk_lines=CHUNK_LINES):
+    """
+    Writes rows of data to a file object.
+    :param rows: The rows to write.  Each row is a sequence of str.
+    :type rows: iterable
+    :param out: The file object to write to.
+    :param header: The names of the columns, written first if given.
+    :type header: list of str
+    :param mode: PIPE or ALIGNED.
+    :type mode: str
+    :param separator: Separates the values in PIPE mode.
+    :type separator: str
+    :param widths: The width of each column in ALIGNED mode.  Found from the rows if not given.
+    :type widths: list of int
+    :param sample_size: In ALIGNED mode without widths, the number of rows used to find the widths.  Values in later
+    rows that are wider are written in full, so the columns won't line up for those rows.  If None, all of the rows
+    are read first.
+    :type sample_size: int
+    :param chunk_lines: The number of lines to write at a time.
+    :type chunk_lines: int
+    :raises: ValueError if the mode isn't known.
+    """
+    if mode == PIPE:
+        lines = (separator.join(row) for row in rows)
+        if header is not None:
+            lines = itertools.chain([separator.join(header)], lines)
+        write_lines(lines, out, chunk_lines=chunk_lines)
+
+    elif mode == ALIGNED:
+        rows = iter(rows)
+        if widths is None:
+            sample = list(rows) if sample_size is None else list(itertools.islice(rows, sample_size))
+            widths = _find_widths(header, sample)
+            rows = itertools.chain(sample, rows)
+
+        lines = (_align(row, widths) for row in rows)
+        if header is not None:
+            rule = "-+-".join("-" * width for width in widths)
+            lines = itertools.chain([_align(header, widths), rule], lines)
+        write_lines(lines, out, chunk_lines=chunk_lines)
+
+    else:
+        raise ValueError(f"Unknown mode {mode}.")
+
+
+def _find_widths(header, rows):
+    """
+    Returns the width of each column, which is the widest value in the column.
+    :param header: The names of the columns, or None.
+    :type header: list of str
+    :param rows: The rows to measure.
+    :type rows: list
+    :return: The width of each column.
+    :rtype: list of int
+    """
+    widths = [len(name) for name in header] if header is not None else []
+    for row in rows:
+        if len(row) > len(widths):
+            widths.extend([0] * (len(row) - len(widths)))
+        for i, value in enumerate(row):
+            if len(value) > widths[i]:
+                widths[i] = len(value)
+    return widths
+
+
+def _align(row, widths):
+    """
+    Pads the values of a row to the column widths.  The last column isn't padded.
+    :param row: The values.
+    :type row: sequence of str
+    :param widths: The width of each column.
+    :type widths: list of int
+    :return: The line for the row.
+    :rtype: str
+    """
+    values = list(row)
+    for i in range(min(len(values) - 1, len(widths))):
+        values[i] = values[i].ljust(widths[i])
+    return " | ".join(values)
@@ -0,0 +1,379 @@
+import atexit
+import json
+import multiprocessing
+import struct
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from .model import DataTable, DictionaryColumn
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains support for sharing a DataTable between processes with shared memory, so that worker processes
+can read a table without it being pickled.  Requires Python 3.8 or later.
+
+A shared table is a single block of shared memory.  It starts with the length of a JSON description of the table
+followed by the description, then a buffer for each column.  Dictionary encoded columns keep their codes array and
+their unique values, other columns keep their values.  Values are stored as UTF-8 text with an array of offsets.
+"""
+
+_LENGTH = struct.Struct("<Q")  # length of the description.
+_OFFSET_TYPE = "Q"  # array type for the offsets of text values.
+_ALIGNMENT = 8
+
+_created = set()  # names of the shared memory created in this process, or the process it was forked from.
+_attached = {}  # name -> DataTable, tables already attached in this process by map_row_ranges workers.
+
+
+class SharedDataTable:
+    """
+    The shared memory holding a table, as returned by DataTable.to_shared().  The memory stays available until
+    unlink() is called, or the with block ends if used as a context manager.
+    """
+
+    def __init__(self, shm):
+        """
+        Wraps the shared memory for a table.
+        :param shm: The shared memory.
+        :type shm: multiprocessing.shared_memory.SharedMemory
+        """
+        self._shm = shm
+        self.name = shm.name  # pass to DataTable.attach() in other processes.
+
+    def close(self):
+        """
+        Closes access to the shared memory from this process.
+        """
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Closes and frees the shared memory.  Tables attached in other processes should no longer be used.
+        """
+        self._shm.close()
+        self._shm.unlink()
+        _created.discard(self.name)
+
+    def __enter__(self):
+        """
+        Returns the shared table for use in a with block.
+        :return: This object.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Frees the shared memory at the end of a with block.
+        """
+        self.unlink()
+
+
+class SharedTextColumn:
+    """
+    A read only column of text values in shared memory.  Values are decoded when read.
+    """
+
+    def __init__(self, offsets, data):
+        """
+        Creates a column from the buffers in shared memory.
+        :param offsets: The offset of each value in the data, plus the end of the last value.
+        :type offsets: memoryview
+        :param data: The UTF-8 values.
+        :type data: memoryview
+        """
+        self._offsets = offsets
+        self._data = data
+
+    def __getitem__(self, index):
+        """
+        Returns the value for a row.
+        :param index: The row number.
+        :type index: int
+        :return: The value.
+        :rtype: str
+        """
+        if index < 0:
+            index += len(self)
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+    def __iter__(self):
+        """
+        Returns the values in row order.
+        :return: An iterator over the values.
+        """
+        return (self[index] for index in range(len(self)))
+
+    def __len__(self):
+        """
+        Returns the number of rows.
+        :return: The number of rows.
+        """
+        return len(self._offsets) - 1
+
+    def append(self, value):
+        """
+        Shared columns can't be changed.
+        :raises: ValueError
+        """
+        raise ValueError("Shared tables are read only.")
+
+
+class SharedDictionaryColumn(DictionaryColumn):
+    """
+    A read only dictionary encoded column whose codes are in shared memory.  The unique values are copied into each
+    process that attaches.
+    """
+
+    def __init__(self, values, codes):
+        """
+        Creates a column from its values and the codes in shared memory.
+        :param values: The unique values.
+        :type values: list of str
+        :param codes: The codes for each row.
+        :type codes: memoryview
+        """
+        super(SharedDictionaryColumn, self).__init__()
+        self.values = values
+        self.codes = codes
+        self._index = {(type(value), value): code for code, value in enumerate(values)}
+
+    def append(self, value):
+        """
+        Shared columns can't be changed.
+        :raises: ValueError
+        """
+        raise ValueError("Shared tables are read only.")
+
+
+def to_shared(table, name=None):
+    """
+    Copies a table into shared memory.  All values must be text, as they are when read from TQL.
+    :param table: The table to share.
+    :type table: DataTable
+    :param name: Optional name for the shared memory.  A unique name is created if not given.
+    :type name: str
+    :return: The shared memory for the table.
+    :rtype: SharedDataTable
+    :raises: TypeError if a value isn't text.
+    """
+    buffers = []  # bytes-like objects in the order they are written.
+    columns = []
+    for column in table._columns:
+        if isinstance(column, DictionaryColumn):
+            offsets, data = _encode_text(column.values)
+            codes = column.codes
+            if isinstance(codes, memoryview):
+                codes = array(codes.format, codes)  # from a table that is already shared.
+            columns.append({"kind": "dictionary", "typecode": codes.typecode, "nbr_values": len(column.values)})
+            buffers.extend([codes, offsets, data])
+        else:
+            offsets, data = _encode_text(column)
+            columns.append({"kind": "text"})
+            buffers.extend([offsets, data])
+
+    sizes = [memoryview(buffer).nbytes for buffer in buffers]
+    description = json.dumps({"header": table.get_header(), "nbr_rows": table.nbr_rows(), "columns": columns,
+                              "sizes": sizes}).encode("utf-8")
+    positions = _positions(len(description), sizes)
+    size = positions[-1] + sizes[-1] if sizes else _LENGTH.size + len(description)
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    _created.add(shm.name)
+    shm.buf[:_LENGTH.size] = _LENGTH.pack(len(description))
+    shm.buf[_LENGTH.size:_LENGTH.size + len(description)] = description
+    for position, size, buffer in zip(positions, sizes, buffers):
+        shm.buf[position:position + size] = memoryview(buffer).cast("B")
+
+    return SharedDataTable(shm)
+
+
+def attach(name):
+    """
+    Returns a read only table for a table in shared memory.  The table reads from the shared memory without copying
+    it, so it can't be used after the shared memory is unlinked.  Use it in the process that created the table, a
+    process forked from it or an unrelated process.  Workers started by map_row_ranges attach on their own.
+    :param name: The name of the shared memory from SharedDataTable.name.
+    :type name: str
+    :return: The table.
+    :rtype: DataTable
+    """
+    return _attach(name, shared_tracker=name in _created)
+
+
+def _attach(name, shared_tracker):
+    """
+    Returns a read only table for a table in shared memory.
+    :param name: The name of the shared memory from SharedDataTable.name.
+    :type name: str
+    :param shared_tracker: True if this process shares the resource tracker of the process that created the memory.
+    :type shared_tracker: bool
+    :return: The table.
+    :rtype: DataTable
+    """
+    shm = _open(name, shared_tracker=shared_tracker)
+    buf = shm.buf
+    length, = _LENGTH.unpack(buf[:_LENGTH.size])
+    description = json.loads(str(buf[_LENGTH.size:_LENGTH.size + length], "utf-8"))
+    sizes = description["sizes"]
+    buffers = iter([buf[position:position + size] for position, size in zip(_positions(length, sizes), sizes)])
+
+    columns = []
+    for column in description["columns"]:
+        if column["kind"] == "dictionary":
+            codes = next(buffers).cast(column["typecode"])
+            values = list(SharedTextColumn(next(buffers).cast(_OFFSET_TYPE), next(buffers)))
+            columns.append(SharedDictionaryColumn(values=values, codes=codes))
+        else:
+            columns.append(SharedTextColumn(next(buffers).cast(_OFFSET_TYPE), next(buffers)))
+
+    table = DataTable._from_columns(header=description["header"], columns=columns,
+                                    nbr_rows=description["nbr_rows"], read_only=True)
+    table._shared_memory = shm  # keeps the memory open as long as the table is used.
+    return table
+
+
+def map_row_ranges(table, function, processes=None, chunk_size=None):
+    """
+    Calls a function on ranges of rows of a table in a pool of processes.  The table is put in shared memory so it
+    isn't copied to each process.  The function is called as function(table, start, stop) and must be picklable,
+    e.g. defined at the top level of a module.
+    :param table: The table to process.
+    :type table: DataTable
+    :param function: The function to call for each range of rows.
+    :param processes: The number of processes to use.  Defaults to the number of CPUs.
+    :type processes: int
+    :param chunk_size: The number of rows in each range.  Defaults to splitting the rows evenly between processes.
+    :type chunk_size: int
+    :return: The results of the function for each range, in row order.
+    :rtype: list
+    """
+    processes = processes or multiprocessing.cpu_count()
+    nbr_rows = table.nbr_rows()
+    chunk_size = chunk_size or max(1, -(-nbr_rows // processes))
+    with to_shared(table) as shared:
+        ranges = [(function, shared.name, start, min(start + chunk_size, nbr_rows))
+                  for start in range(0, nbr_rows, chunk_size)]
+        with multiprocessing.Pool(processes) as pool:
+            return pool.starmap(_call_with_range, ranges)
+
+
+def _call_with_range(function, name, start, stop):
+    """
+    Calls a function with a range of rows of a shared table.  Runs in the worker processes of map_row_ranges.
+    :param function: The function to call.
+    :param name: The name of the shared memory.
+    :type name: str
+    :param start: The first row.
+    :type start: int
+    :param stop: The row after the last row.
+    :type stop: int
+    :return: The result of the function.
+    """
+    table = _attached.get(name)
+    if table is None:
+        if not _attached:
+            atexit.register(_detach_all)
+        table = _attached[name] = _attach(name, shared_tracker=True)  # workers use the pool's tracker.
+    return function(table, start, stop)
+
+
+def _detach_all():
+    """
+    Closes the tables attached by a worker process.  The views into the shared memory have to be released before the
+    memory can be closed, which doesn't happen in a reliable order when the process exits.
+    """
+    for table in _attached.values():
+        shm = table._shared_memory
+        table._columns = []
+        table._nbr_rows = 0
+        del table._shared_memory
+        shm.close()
+    _attached.clear()
+
+
+def _open(name, shared_tracker):
+    """
+    Opens existing shared memory without the resource tracker taking ownership of it, which would free it when this
+    process ends.
+    :param name: The name of the shared memory.
+    :type name: str
+    :param shared_tracker: True if this process shares the resource tracker of the process that created the memory.
+    :type shared_tracker: bool
+    :return: The shared memory.
+    :rtype: multiprocessing.shared_memory.SharedMemory
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13 and later.
+    except TypeError:
+        pass
+
+    # Earlier versions always register the memory.  A process with its own tracker has to unregister it.  A shared
+    # tracker already has it registered by the creator, and unregistering would drop the creator's registration.
+    shm = shared_memory.SharedMemory(name=name)
+    if not shared_tracker:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _encode_text(values):
+    """
+    Encodes text values as UTF-8 with the offset of each value.
+    :param values: The values to encode.
+    :type values: iterable of str
+    :return: The offsets, with one more for the end of the last value, and the encoded values.
+    :rtype: array, bytes
+    :raises: TypeError if a value isn't text.
+    """
+    offsets = array(_OFFSET_TYPE, [0])
+    parts = []
+    position = 0
+    for value in values:
+        if not isinstance(value, str):
+            raise TypeError(f"Only text values can be shared, not {type(value).__name__}: {value!r}")
+        encoded = value.encode("utf-8")
+        parts.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return offsets, b"".join(parts)
+
+
+def _positions(description_length, sizes):
+    """
+    Returns where each buffer starts in the shared memory.
+    :param description_length: The length of the encoded description.
+    :type description_length: int
+    :param sizes: The size of each buffer.
+    :type sizes: list of int
+    :return: The position of each buffer.
+    :rtype: list of int
+    """
+    positions = []
+    position = _align(_LENGTH.size + description_length)
+    for size in sizes:
+        positions.append(position)
+        position = _align(position + size)
+    return positions
+
+
+def _align(position):
+    """
+    Rounds a position up so that arrays start on a word boundary.
+    :param position: The position.
+    :type position: int
+    :return: The aligned position.
+    :rtype: int
+    """
+    return -(-position // _ALIGNMENT) * _ALIGNMENT
@@ -0,0 +1,343 @@
+import math
+import random
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains classes for computing column statistics in a single pass over the rows, using sketches so that
+memory doesn't grow with the number of rows.
+"""
+
+# Values that are counted as nulls instead of values.
+NULL_VALUES = frozenset(["", "{null}"])
+
+_HASH_MASK = (1 << 64) - 1
+
+
+class HyperLogLog:
+    """
+    Estimates the number of distinct values using a fixed number of registers.  The standard error is about
+    1.04 / sqrt(2 ** precision), e.g. 1.6% for the default precision of 12, which uses 4 KB.  Values are hashed with
+    Python's string hash, which is fast but differs between processes, so estimators from different processes can't
+    be combined.
+    """
+
+    def __init__(self, precision=12):
+        """
+        Creates a new, empty estimator.
+        :param precision: The number of bits used to pick a register, from 4 to 16.
+        :type precision: int
+        """
+        assert 4 <= precision <= 16
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add(self, value):
+        """
+        Adds a value.  Values are hashed by their string form, so "1" and 1 are the same value.
+        :param value: The value to add.
+        """
+        hashed = hash(value if isinstance(value, str) else str(value)) & _HASH_MASK
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1  # position of the first 1 bit.
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def estimate(self):
+        """
+        Returns the estimated number of distinct values.
+        :return: The estimate.
+        :rtype: int
+        """
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self._registers)
+
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting is more accurate for small counts.
+
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """
+    Estimates quantiles with a KLL style sketch.  Values are kept in levels of compactors.  When a level is full it is
+    sorted and every other value is moved up a level, where each value stands for twice as many values.  Higher
+    levels get more space, so the size is bounded by about 3 * k values.
+    """
+
+    def __init__(self, k=200, seed=None):
+        """
+        Creates a new, empty sketch.
+        :param k: The capacity of the top level.  Larger values are more accurate and use more memory.
+        :type k: int
+        :param seed: Seed for choosing which values are moved up, for repeatable results.
+        :type seed: int
+        """
+        self.k = k
+        self.count = 0
+        self._levels = [[]]
+        self._capacities = [self._capacity(0)]
+        self._size = 0
+        self._max_size = self._capacities[0]
+        self._random = random.Random(seed)
+
+    def _capacity(self, level):
+        """
+        Returns the number of values a level can hold before it's compacted.
+        :param level: The level, 0 being the lowest.
+        :type level: int
+        :return: The capacity of the level.
+        :rtype: int
+        """
+        depth = len(self._levels) - level - 1
+        return max(2, int(self.k * (2 / 3) ** depth))
+
+    def add(self, value):
+        """
+        Adds a value.
+        :param value: The value to add.  All values must be comparable with each other.
+        """
+        self._levels[0].append(value)
+        self._size += 1
+        self.count += 1
+        if self._size >= self._max_size:
+            self._compact()
+
+    def _compact(self):
+        """
+        Moves half of the values in the lowest full level up a level.
+        """
+        for level, values in enumerate(self._levels):
+            if len(values) < self._capacities[level]:
+                continue
+
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+                self._capacities = [self._capacity(h) for h in range(len(self._levels))]
+                self._max_size = sum(self._capacities)
+
+            values.sort()
+            kept = [values.pop()] if len(values) % 2 else []
+            promoted = values[self._random.getrandbits(1)::2]
+            self._levels[level + 1].extend(promoted)
+            self._size -= len(values) - len(promoted)
+            values[:] = kept
+            break
+
+    def quantiles(self, fractions):
+        """
+        Returns the estimated values at some fractions of the values, e.g. 0.5 for the median.
+        :param fractions: The fractions, from 0 to 1.
+        :type fractions: list of float
+        :return: The value for each fraction, or None for each if there are no values.
+        :rtype: list
+        """
+        weighted = sorted((value, 1 << level) for level, values in enumerate(self._levels) for value in values)
+        if not weighted:
+            return [None] * len(fractions)
+
+        total = sum(weight for value, weight in weighted)
+        results = []
+        for fraction in fractions:
+            target = fraction * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    break
+            results.append(value)
+
+        return results
+
+
+class ColumnStats:
+    """
+    Statistics for the values of one column.  Nulls are counted separately from values.  While every value is a
+    number, the minimum, maximum, mean and quantiles are numeric, otherwise the minimum and maximum compare the values
+    as text and there is no mean or quantiles.
+    """
+
+    QUANTILES = (0.25, 0.5, 0.75)
+
+    def __init__(self, name):
+        """
+        Creates new, empty statistics.
+        :param name: The name of the column.
+        :type name: str
+        """
+        self.name = name
+        self.count = 0  # values that aren't null.
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.sketch = QuantileSketch()
+
+        self._numeric = True
+        self._sum = 0.0
+        self._min = None  # (number, value) while numeric.
+        self._max = None
+        self._text_min = None
+        self._text_max = None
+
+    def add(self, value):
+        """
+        Adds a value from the column.
+        :param value: The value to add.
+        """
+        if value is None or (isinstance(value, str) and value in NULL_VALUES):
+            self.nulls += 1
+            return
+
+        self.count += 1
+        text = value if isinstance(value, str) else str(value)
+        self.distinct.add(text)
+
+        if self._text_min is None or text < self._text_min:
+            self._text_min = text
+        if self._text_max is None or text > self._text_max:
+            self._text_max = text
+
+        if self._numeric:
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                number = math.nan
+            if math.isnan(number):
+                self._numeric = False
+                self.sketch = None  # text doesn't have useful quantiles.
+                return
+
+            self._sum += number
+            self.sketch.add(number)
+            if self._min is None or number < self._min[0]:
+                self._min = (number, value)
+            if self._max is None or number > self._max[0]:
+                self._max = (number, value)
+
+    def is_numeric(self):
+        """
+        Returns True if every value is a number.
+        :return: True if the values are numbers.
+        :rtype: bool
+        """
+        return self._numeric and self.count > 0
+
+    def get_min(self):
+        """
+        Returns the smallest value, as it was added.
+        :return: The smallest value or None if there are no values.
+        """
+        return self._min[1] if self.is_numeric() else self._text_min
+
+    def get_max(self):
+        """
+        Returns the largest value, as it was added.
+        :return: The largest value or None if there are no values.
+        """
+        return self._max[1] if self.is_numeric() else self._text_max
+
+    def get_mean(self):
+        """
+        Returns the mean of numeric values.
+        :return: The mean or None if the values aren't numbers.
+        :rtype: float
+        """
+        return self._sum / self.count if self.is_numeric() else None
+
+    def get_quantiles(self, fractions=QUANTILES):
+        """
+        Returns the estimated quantiles of numeric values.
+        :param fractions: The fractions to return values for, e.g. 0.5 for the median.
+        :type fractions: list of float
+        :return: The estimated value for each fraction, or None for each if the values aren't numbers.
+        :rtype: list of float
+        """
+        if not self.is_numeric():
+            return [None] * len(fractions)
+        return self.sketch.quantiles(fractions)
+
+    def summary(self):
+        """
+        Returns all of the statistics.
+        :return: The column name, count, nulls, distinct (estimated), min, max, mean and the 25th, 50th and 75th
+        percentiles (estimated).
+        :rtype: dict
+        """
+        p25, p50, p75 = self.get_quantiles()
+        return {
+            "column": self.name,
+            "count": self.count,
+            "nulls": self.nulls,
+            "distinct": self.distinct.estimate() if self.count else 0,
+            "min": self.get_min(),
+            "max": self.get_max(),
+            "mean": self.get_mean(),
+            "p25": p25,
+            "p50": p50,
+            "p75": p75,
+        }
+
+
+class TableStats:
+    """
+    Statistics for each column of a table, updated a row at a time.
+    """
+
+    def __init__(self, header=None):
+        """
+        Creates new, empty statistics.
+        :param header: The names of the columns.  If not given, the columns are named by index from the first row.
+        :type header: list of str
+        """
+        self.columns = [ColumnStats(name) for name in header or []]
+        self.nbr_rows = 0
+
+    def add_row(self, row):
+        """
+        Adds a row of values.
+        :param row: The values, one per column.
+        :type row: list
+        """
+        if not self.columns and self.nbr_rows == 0:
+            self.columns = [ColumnStats(str(index)) for index in range(len(row))]
+        self.nbr_rows += 1
+        for column, value in zip(self.columns, row):
+            column.add(value)
+
+    def get_column(self, column):
+        """
+        Returns the statistics for a column.
+        :param column: Either an index (int, zero-based) or column name (str)
+        :type column: str or int
+        :return: The statistics for the column.
+        :rtype: ColumnStats
+        :raises: ValueError if the column doesn't exist.
+        """
+        if isinstance(column, int) and 0 <= column < len(self.columns):
+            return self.columns[column]
+        for stats in self.columns:
+            if stats.name == column:
+                return stats
+        raise ValueError(f"Invalid column {column} for table.")
+
+    def summary(self):
+        """
+        Returns the statistics for each column.
+        :return: The summary of each column, see ColumnStats.summary().
+        :rtype: list of dict
+        """
+        return [column.summary() for column in self.columns]
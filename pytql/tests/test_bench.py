@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+
+from pytql.bench import percentile, read_statements, replay, statement_type
+from pytql.tql import TQLError
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+class FakeSession:
+    """Stands in for a TQL session and records the statements it runs."""
+
+    def __init__(self):
+        self.statements = []
+
+    def run_tql_command(self, command):
+        self.statements.append(command)
+        if "bad" in command:
+            raise TQLError("Error from TQL: error=bad")
+        return ["1"]
+
+
+class TestBench(unittest.TestCase):
+    """Tests the workload replay functions."""
+
+    def test_read_statements_from_script(self):
+        """Tests reading statements from a script with comments and statements over several lines."""
+        lines = ["-- a comment\n", "use foo;\n", "\n", "# another comment\n", "select *\n", "  from t;\n",
+                 "show tables"]
+        self.assertEqual(["use foo;", "select * from t;", "show tables;"], read_statements(lines))
+
+    def test_read_statements_from_log(self):
+        """Tests reading only the statements from a log of a session."""
+        lines = ["rtql [database=foo] > use foo;", "Database changed",
+                 "rtql [database=foo] > select *", "$> from t;", "a|b", "1|2", "(1 rows)",
+                 "TQL [database=foo]> show tables;"]
+        self.assertEqual(["use foo;", "select * from t;", "show tables;"], read_statements(lines))
+
+    def test_statement_type(self):
+        """Tests getting the type of a statement."""
+        self.assertEqual("SELECT", statement_type("select * from t;"))
+        self.assertEqual("SHOW", statement_type("show;"))
+        self.assertEqual("", statement_type(""))
+
+    def test_percentile(self):
+        """Tests the nearest rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(99, percentile(values, 99))
+        self.assertEqual(100, percentile(values, 100))
+        self.assertEqual(1, percentile([1], 90))
+        self.assertEqual(0.0, percentile([], 50))
+
+    def test_replay(self):
+        """Tests that each session runs the statements in order and the results are counted by type."""
+        sessions = []
+
+        def session_factory():
+            sessions.append(FakeSession())
+            return sessions[-1]
+
+        statements = ["use foo;", "select 1;", "select bad;"]
+        results = replay(statements, session_factory, sessions=3, repeat=2)
+
+        self.assertEqual(3, len(sessions))
+        for session in sessions:
+            self.assertEqual(statements * 2, session.statements)  # each session runs the script in order.
+
+        summary = results.get_summary()
+        self.assertEqual(18, summary["ALL"]["count"])
+        self.assertEqual(6, summary["USE"]["count"])
+        self.assertEqual(0, summary["USE"]["errors"])
+        self.assertEqual(12, summary["SELECT"]["count"])
+        self.assertEqual(6, summary["SELECT"]["errors"])
+        self.assertAlmostEqual(0.5, summary["SELECT"]["error_rate"])
+        self.assertLessEqual(summary["ALL"]["p50"], summary["ALL"]["max"])
+
+    def test_errors_in_output(self):
+        """Tests that errors are counted for sessions that return TQL's error message instead of raising it."""
+
+        class ShellSession(FakeSession):
+            def run_tql_command(self, command):
+                if "bad" in command:
+                    return ["select bad;", "Error: error=bad column"]
+                return ["1", "Statement executed successfully."]
+
+        summary = replay(["select 1;", "select bad;"], ShellSession).get_summary()
+        self.assertEqual(1, summary["SELECT"]["errors"])
+        self.assertAlmostEqual(0.5, summary["SELECT"]["error_rate"])
+
+    def test_replay_at_rate(self):
+        """Tests that statements are spread out to the target rate."""
+        lock = threading.Lock()
+        times = []
+
+        class TimedSession(FakeSession):
+            def run_tql_command(self, command):
+                with lock:
+                    times.append(time.time())
+
+        results = replay(["select 1;"], TimedSession, sessions=2, rate=50, repeat=5)
+
+        # 10 statements at 50 per second take at least 9 intervals.
+        self.assertEqual(10, len(times))
+        self.assertGreaterEqual(max(times) - results.start, 9 / 50 - 0.01)
+
+    def test_latency_includes_time_behind_schedule(self):
+        """Tests that with a rate, statements that start late include the wait in their latency."""
+
+        class SlowSession(FakeSession):
+            def run_tql_command(self, command):
+                time.sleep(0.05)
+
+        # one session can only run 20 statements a second, so each statement starts later than scheduled.
+        results = replay(["select 1;"], SlowSession, sessions=1, rate=100, repeat=10)
+        summary = results.get_summary()["ALL"]
+        self.assertGreater(summary["max"], 0.3)
+        self.assertGreater(summary["p50"], 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import threading
+import unittest
+
+from pytql.coalesce import CoalescingTQL
+from pytql.model import DataTable
+from pytql.tql import RemoteTQL
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+class BlockingTQL:
+    """Stands in for TQL.  Queries block until released so that callers overlap."""
+
+    def __init__(self):
+        self.database = "foo"
+        self.release = threading.Event()
+        self.queries = []
+
+    def execute_tql_query(self, query):
+        self.queries.append(query)
+        self.release.wait(5)
+        if "bad" in query:
+            raise ValueError("bad query")
+        return DataTable(header=["col1"], data=[[query]])
+
+    def get_databases(self):
+        self.release.wait(5)
+        return ["foo"]
+
+
+class UnconnectedRemoteTQL(RemoteTQL):
+    """Stands in for a RemoteTQL without opening a connection."""
+
+    def __init__(self):
+        pass
+
+    def __del__(self):
+        pass
+
+
+class TestCoalescingTQL(unittest.TestCase):
+    """Tests the CoalescingTQL class."""
+
+    def _run_concurrently(self, function, nbr_threads):
+        """Runs the function in several threads and returns the results once they are all waiting."""
+        results = [None] * nbr_threads
+
+        def run(index):
+            try:
+                results[index] = function()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(nbr_threads)]
+        for thread in threads:
+            thread.start()
+
+        # wait until all but the first are waiting on the first call.
+        while self.ctql.get_metrics()["calls"] < nbr_threads:
+            threading.Event().wait(0.01)
+        self.tql.release.set()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def setUp(self) -> None:
+        self.tql = BlockingTQL()
+        self.ctql = CoalescingTQL(self.tql)
+
+    def test_identical_queries_coalesce(self):
+        """Tests that identical overlapping queries are only run once."""
+        results = self._run_concurrently(lambda: self.ctql.execute_tql_query("SELECT * FROM foo;"), 5)
+
+        self.assertEqual(1, len(self.tql.queries))
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual({"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}, self.ctql.get_metrics())
+
+    def test_errors_are_shared(self):
+        """Tests that an error is raised to all of the waiting callers."""
+        results = self._run_concurrently(lambda: self.ctql.execute_tql_query("SELECT bad FROM foo;"), 3)
+
+        self.assertEqual(1, len(self.tql.queries))
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_different_databases_do_not_coalesce(self):
+        """Tests that the same query against another database is run separately."""
+        self.tql.release.set()
+        self.ctql.execute_tql_query("SELECT * FROM foo;")
+        self.tql.database = "bar"
+        self.ctql.execute_tql_query("SELECT * FROM foo;")
+
+        self.assertEqual(2, len(self.tql.queries))
+        self.assertEqual(0, self.ctql.get_metrics()["coalesced"])
+
+    def test_literals_with_different_spacing_do_not_coalesce(self):
+        """Tests that whitespace is only ignored outside of quoted literals."""
+        self.assertEqual("SELECT * FROM foo WHERE n = 'a  b'",
+                         CoalescingTQL._normalize(" SELECT  *\nFROM foo WHERE n = 'a  b' ;"))
+
+        queries = ["SELECT * FROM foo WHERE n = 'a  b';", "SELECT * FROM foo WHERE n = 'a b';"]
+        to_run = list(queries)
+        results = self._run_concurrently(lambda: self.ctql.execute_tql_query(to_run.pop()), 2)
+
+        self.assertEqual(0, self.ctql.get_metrics()["coalesced"])
+        self.assertCountEqual(queries, [r.get_row(0).get_data()[0] for r in results])
+
+    def test_get_databases(self):
+        """Tests that getting the databases coalesces."""
+        results = self._run_concurrently(self.ctql.get_databases, 3)
+
+        self.assertEqual([["foo"]] * 3, results)
+        self.assertEqual(2, self.ctql.get_metrics()["coalesced"])
+
+    def test_serialize_by_default_for_remote_tql(self):
+        """Tests that queries to a RemoteTQL, which has one channel, are sent one at a time by default."""
+        self.assertIsNotNone(CoalescingTQL(UnconnectedRemoteTQL())._execute_lock)
+        self.assertIsNone(CoalescingTQL(self.tql)._execute_lock)
+        self.assertIsNone(CoalescingTQL(UnconnectedRemoteTQL(), serialize=False)._execute_lock)
+
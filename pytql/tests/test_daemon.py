@@ -0,0 +1,223 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import paramiko
+
+from pytql.daemon import DaemonError, DaemonTQL, TQLDaemon, _Session, connect_to_daemon, is_running
+from pytql.model import DataTable
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+class FakeSession:
+    """Stands in for a RemoteTQL session so no SSH connection is needed."""
+
+    connections = 0
+    commands = []  # commands run by all sessions.
+    fail = None  # "before" or "after" to drop the connection before or after the next command is sent.
+
+    def __init__(self):
+        FakeSession.connections += 1
+        self.prompt = "rtql [database=none] > "
+        self.database = None
+        self.active = True
+        self.queries = 0
+
+    def is_active(self):
+        return self.active
+
+    def get_metrics(self):
+        return {"queries": self.queries}
+
+    def run_tql_command(self, command, max_rows=None, max_result_bytes=None):
+        fail, FakeSession.fail = FakeSession.fail, None
+        if fail == "before":
+            raise socket.error("connection dropped")
+        self.queries += 1
+        FakeSession.commands.append(command)
+        if fail == "after":
+            raise socket.error("connection dropped")
+        if command.startswith("use "):
+            self.database = command[4:].strip(";")
+            self.prompt = f"rtql [database={self.database}] > "
+        return [command, "Statement executed successfully."]
+
+    def head(self, query, n=10):
+        return DataTable(header=["col1"], data=[[str(i)] for i in range(n)])
+
+
+class TestDaemon(unittest.TestCase):
+    """Tests the TQLDaemon and DaemonTQL classes."""
+
+    def setUp(self) -> None:
+        FakeSession.connections = 0
+        FakeSession.commands = []
+        FakeSession.fail = None
+        self.patcher = mock.patch.object(_Session, "_connect", lambda session: FakeSession())
+        self.patcher.start()
+
+        self.socket_path = os.path.join(tempfile.mkdtemp(), "rtqld.sock")
+        self.daemon = TQLDaemon(socket_path=self.socket_path, keepalive=60)
+        self.thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+        self.thread.start()
+        while not is_running(self.socket_path):
+            time.sleep(0.01)
+
+    def tearDown(self) -> None:
+        self.daemon.shutdown()
+        self.thread.join()
+        self.patcher.stop()
+
+    def _attach(self, password="pw"):
+        return DaemonTQL(hostname="tstest", username="admin", password=password, socket_path=self.socket_path)
+
+    def test_sessions_are_reused(self):
+        """Tests that clients for the same host share one connection and its database."""
+        rtql = self._attach()
+        rtql.run_tql_command("use foo;")
+        self.assertEqual("foo", rtql.database)
+        del rtql
+
+        rtql = self._attach()
+        self.assertEqual(["bar;", "Statement executed successfully."], rtql.run_tql_command("bar;"))
+        self.assertEqual("rtql [database=foo] > ", rtql.prompt)
+        self.assertEqual(1, FakeSession.connections)
+
+    def test_wrong_password(self):
+        """Tests that an existing session isn't given to a client with a different password."""
+        self._attach()
+        with self.assertRaises(paramiko.ssh_exception.AuthenticationException):
+            self._attach(password="wrong")
+
+    def test_reconnect(self):
+        """Tests that a dropped session is reopened in the same database."""
+        rtql = self._attach()
+        rtql.run_tql_command("use foo;")
+        self.daemon._sessions[("tstest", "admin")].tql.active = False
+
+        rtql.run_tql_command("bar;")
+        self.assertEqual(2, FakeSession.connections)
+        self.assertEqual("foo", rtql.database)
+
+    def test_clients_keep_their_database(self):
+        """Tests that a use from one client doesn't change the database of another client."""
+        rtql1 = self._attach()
+        rtql2 = self._attach()
+        rtql1.run_tql_command("use foo;")
+        rtql2.run_tql_command("use bar;")
+
+        FakeSession.commands = []
+        rtql1.run_tql_command("select 1;")
+        self.assertEqual(["use foo;", "select 1;"], FakeSession.commands)
+        self.assertEqual("foo", rtql1.database)
+        self.assertEqual("rtql [database=foo] > ", rtql1.prompt)
+
+        FakeSession.commands = []
+        rtql2.run_tql_command("select 2;")
+        self.assertEqual(["use bar;", "select 2;"], FakeSession.commands)
+        self.assertEqual("bar", rtql2.database)
+
+    def test_client_without_database(self):
+        """Tests that a client that isn't using a database doesn't run in another client's database."""
+        rtql1 = self._attach()
+        rtql2 = self._attach()
+        rtql2.run_tql_command("use bar;")
+
+        FakeSession.commands = []
+        rtql1.run_tql_command("select 1;")
+        self.assertEqual(["select 1;"], FakeSession.commands)
+        self.assertEqual(2, FakeSession.connections)  # a new session that isn't in a database.
+        self.assertIsNone(rtql1.database)
+
+        rtql2.run_tql_command("select 2;")
+        self.assertEqual(["select 1;", "use bar;", "select 2;"], FakeSession.commands)
+
+    def test_partial_statements_are_kept_per_client(self):
+        """Tests that the lines of one client's statement aren't mixed with another client's commands."""
+        self._attach().run_tql_command("use foo;")
+        rtql1 = self._attach()
+        rtql2 = self._attach()
+
+        FakeSession.commands = []
+        self.assertEqual([], rtql1.run_tql_command("select *"))
+        self.assertEqual("$> ", rtql1.prompt)
+        rtql2.run_tql_command("use bar;")
+        rtql2.run_tql_command("select 2;")
+        self.assertEqual(["use bar;", "select 2;"], FakeSession.commands)
+
+        FakeSession.commands = []
+        self.assertEqual(["from foo;", "Statement executed successfully."], rtql1.run_tql_command("from foo;"))
+        self.assertEqual(["use foo;", "select *", "from foo;"], FakeSession.commands)
+        self.assertEqual("rtql [database=foo] > ", rtql1.prompt)
+
+    def test_retry_when_not_sent(self):
+        """Tests that a command is sent again when the connection dropped before it was sent."""
+        rtql = self._attach()
+        FakeSession.fail = "before"
+        self.assertEqual(["bar;", "Statement executed successfully."], rtql.run_tql_command("bar;"))
+        self.assertEqual(["bar;"], FakeSession.commands)
+        self.assertEqual(2, FakeSession.connections)
+
+    def test_no_retry_after_sent(self):
+        """Tests that a command that may have run isn't run again when the connection drops."""
+        rtql = self._attach()
+        FakeSession.fail = "after"
+        with self.assertRaises(DaemonError):
+            rtql.run_tql_command("insert into foo values (1);")
+        self.assertEqual(["insert into foo values (1);"], FakeSession.commands)
+        self.assertEqual(2, FakeSession.connections)  # reconnected for the next command.
+        rtql.run_tql_command("bar;")
+
+    def test_slow_connect_only_blocks_its_host(self):
+        """Tests that opening a session to one host doesn't hold up clients of other hosts."""
+        release = threading.Event()
+
+        def connect(session):
+            if session.hostname == "slow":
+                release.wait(5)
+            return FakeSession()
+
+        with mock.patch.object(_Session, "_connect", connect):
+            thread = threading.Thread(target=lambda: DaemonTQL(hostname="slow", username="admin", password="pw",
+                                                                socket_path=self.socket_path))
+            thread.start()
+            try:
+                start = time.time()
+                self._attach().run_tql_command("bar;")
+                self.daemon.get_status()
+                self.assertLess(time.time() - start, 2)
+            finally:
+                release.set()
+                thread.join()
+
+    def test_daemon_run_by_another_user(self):
+        """Tests that credentials aren't sent to a daemon run by another user."""
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(DaemonError):
+                connect_to_daemon(self.socket_path)
+
+    def test_head(self):
+        """Tests getting the first rows through the daemon."""
+        table = self._attach().head("SELECT * FROM foo;", n=3)
+        self.assertEqual(["col1"], table.get_header())
+        self.assertEqual(3, table.nbr_rows())
@@ -0,0 +1,47 @@
+import tracemalloc
+import unittest
+
+from pytql.memory import trace_memory
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+class TestMemory(unittest.TestCase):
+    """Tests the memory tracing tools."""
+
+    def test_trace_memory(self):
+        """Tests that the memory allocated in a block is reported."""
+        tracing = tracemalloc.is_tracing()
+        with trace_memory() as trace:
+            data = [bytearray(100000) for _ in range(5)]
+
+        self.assertGreaterEqual(trace.peak, 500000)
+        self.assertGreaterEqual(trace.current, 500000)
+        self.assertGreaterEqual(trace.top(limit=1)[0].size, 500000)
+        self.assertTrue(str(trace).startswith(f"current: {trace.current} bytes, peak: {trace.peak} bytes\n"))
+        self.assertEqual(tracing, tracemalloc.is_tracing())  # only stopped if it was started by the trace.
+        del data
+
+    def test_peak_is_for_the_block(self):
+        """Tests that memory freed before the block ends only counts towards the peak."""
+        with trace_memory() as trace:
+            data = bytearray(1000000)
+            del data
+
+        self.assertGreaterEqual(trace.peak, 1000000)
+        self.assertLess(trace.current, 1000000)
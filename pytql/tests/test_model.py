@@ -1,6 +1,6 @@
 import unittest
 
-from pytql.model import Row, DataTable
+from pytql.model import Row, DataTable, DictionaryColumn
 
 """
 Copyright 2019 ThoughtSpot
@@ -132,3 +132,101 @@ class TestDataTable(unittest.TestCase):
                 total += column
 
         self.assertEqual(1+2+3+4+5+6, total)
+
+    def test_get_header(self):
+        """Tests getting the column names."""
+        table = DataTable(header=["col1", "col2", "col3"])
+        header = table.get_header()
+        self.assertEqual(["col1", "col2", "col3"], header)
+
+        header.append("col4")
+        self.assertEqual(3, table.nbr_columns())
+
+    def test_memory_usage(self):
+        """Tests getting the memory used by a table."""
+        table = DataTable(header=["col1", "col2"], data=[["a", "bb"], ["c", "dd"]])
+
+        usage = table.memory_usage(deep=True)
+        self.assertEqual(["col1", "col2"], list(usage["columns"]))
+        self.assertGreater(usage["columns"]["col2"], usage["columns"]["col1"])
+        self.assertGreater(usage["structures"]["codes"], 0)
+        self.assertEqual(sum(usage["columns"].values()) + usage["header"] + usage["table"], usage["total"])
+
+        shallow = table.memory_usage(deep=False)
+        self.assertEqual(shallow["columns"]["col1"], shallow["columns"]["col2"])
+        self.assertLess(shallow["total"], usage["total"])
+
+    def test_dictionary_encoding(self):
+        """Tests that low cardinality columns are dictionary encoded and high cardinality ones aren't."""
+        nbr_rows = DataTable.DICTIONARY_MIN_ROWS * 2
+        table = DataTable(header=["status", "id"], data=[["ok" if i % 3 else "failed", str(i)]
+                                                         for i in range(nbr_rows)])
+
+        self.assertTrue(table.is_dictionary_encoded("status"))
+        self.assertFalse(table.is_dictionary_encoded("id"))
+        self.assertEqual(nbr_rows, table.nbr_rows())
+        self.assertEqual(["failed", "0"], table.get_row(0).get_data())
+        self.assertEqual([str(i) for i in range(nbr_rows)], table.get_column("id"))
+
+        usage = table.memory_usage()
+        self.assertLess(usage["columns"]["status"], usage["columns"]["id"])
+
+    def test_filter_equals(self):
+        """Tests filtering rows on a value."""
+        table = DataTable(header=["db", "status"], data=[["a", "ok"], ["b", "failed"], ["a", "failed"]])
+
+        self.assertEqual([["a", "ok"], ["a", "failed"]],
+                         [row.get_data() for row in table.filter_equals("db", "a")])
+        self.assertEqual(0, table.filter_equals("db", "x").nbr_rows())
+        self.assertEqual(2, table.filter_equals(1, "failed").nbr_rows())
+
+    def test_group_by(self):
+        """Tests grouping and counting rows by value."""
+        table = DataTable(header=["db", "status"], data=[["a", "ok"], ["b", "failed"], ["a", "failed"]])
+
+        groups = table.group_by("db")
+        self.assertEqual(["a", "b"], list(groups))
+        self.assertEqual(["ok", "failed"], groups["a"].get_column("status"))
+        self.assertEqual({"ok": 1, "failed": 2}, table.value_counts("status"))
+
+    def test_describe(self):
+        """Tests the column statistics, with and without tracking them as rows are added."""
+        data = [["1", "a", "10.5"], ["2", "b", "{null}"], ["3", "a", "20"]]
+        for stats in (True, False):
+            table = DataTable(header=["id", "name", "score"], data=data, stats=stats)
+            description = table.describe()
+            self.assertEqual(DataTable.DESCRIBE_HEADER, description.get_header())
+            self.assertEqual(["id", "3", "0", "3", "1", "3", "2", "1", "2", "3"], description.get_row(0).get_data())
+            self.assertEqual(["name", "3", "0", "2", "a", "b", "", "", "", ""], description.get_row(1).get_data())
+            self.assertEqual(["score", "2", "1", "2", "10.5", "20", "15.25"], description.get_row(2).get_data()[:7])
+
+    def test_iterate_twice(self):
+        """Tests that a table can be iterated over more than once."""
+        table = DataTable(header=["col1"], data=[["a"], ["b"]])
+        self.assertEqual(2, len(list(table)))
+        self.assertEqual(2, len(list(table)))
+
+
+class TestDictionaryColumn(unittest.TestCase):
+    """Tests the DictionaryColumn class."""
+
+    def test_equal_values_of_different_types(self):
+        """Tests that values that compare equal but have different types are kept as they were added."""
+        table = DataTable(header=["c"], data=[[1], [True], [1.0], [0], [False]])
+        self.assertEqual([1, True, 1.0, 0, False], table.get_column("c"))
+        self.assertEqual([bool, float], [type(v) for v in table.get_column("c")[1:3]])
+        self.assertEqual({1: 3, 0: 2}, table.value_counts("c"))
+        self.assertEqual([1, True, 1.0], table.filter_equals("c", 1).get_column("c"))
+
+    def test_codes_grow(self):
+        """Tests that codes get larger once there are too many values for the current type."""
+        column = DictionaryColumn(["a", "b", "a"])
+        self.assertEqual(1, column.codes.itemsize)
+        self.assertEqual(["a", "b", "a"], list(column))
+
+        for value in range(300):
+            column.append(value)
+        self.assertEqual(2, column.codes.itemsize)
+        self.assertEqual(302, column.cardinality())
+        self.assertEqual(299, column[-1])
+        self.assertEqual("b", column[1])
@@ -0,0 +1,88 @@
+import io
+import unittest
+
+from pytql.model import DataTable
+from pytql.render import ALIGNED, PIPE, render, write_lines
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+class TestRender(unittest.TestCase):
+    """Tests the render functions."""
+
+    def test_write_lines(self):
+        """Tests writing lines in chunks."""
+        out = io.StringIO()
+        write_lines((str(i) for i in range(5)), out, chunk_lines=2)
+        self.assertEqual("0\n1\n2\n3\n4\n", out.getvalue())
+
+    def test_write_no_lines(self):
+        """Tests that nothing is written when there are no lines."""
+        out = io.StringIO()
+        write_lines([], out)
+        self.assertEqual("", out.getvalue())
+
+    def test_pipe(self):
+        """Tests writing rows separated by pipes."""
+        out = io.StringIO()
+        render([["1", "a"], ["2", "b"]], out, header=["col1", "col2"], mode=PIPE)
+        self.assertEqual("col1|col2\n1|a\n2|b\n", out.getvalue())
+
+    def test_aligned(self):
+        """Tests writing rows with the columns lined up."""
+        out = io.StringIO()
+        render([["1", "abcdef"], ["22", "b"]], out, header=["c", "col2"], mode=ALIGNED)
+        self.assertEqual("c  | col2\n---+-------\n1  | abcdef\n22 | b\n", out.getvalue())
+
+    def test_aligned_with_sample(self):
+        """Tests finding the column widths from a sample of the rows."""
+        out = io.StringIO()
+        render(iter([["1", "a"], ["333", "b"]]), out, mode=ALIGNED, sample_size=1)
+        self.assertEqual("1 | a\n333 | b\n", out.getvalue())  # wider values after the sample are written in full.
+
+    def test_unknown_mode(self):
+        """Tests that an unknown mode raises an error."""
+        with self.assertRaises(ValueError):
+            render([], io.StringIO(), mode="fancy")
+
+    def test_table_render(self):
+        """Tests printing and rendering a table."""
+        table = DataTable(header=["id", "name"], data=[["1", "alpha"], ["22", "b"]])
+        self.assertEqual("id|name\n1|alpha\n22|b\n", str(table))
+
+        out = io.StringIO()
+        table.render(out, mode=ALIGNED)
+        self.assertEqual("id | name\n---+------\n1  | alpha\n22 | b\n", out.getvalue())
+
+    def test_dictionary_encoded_table_render(self):
+        """Tests rendering a table with a dictionary encoded column."""
+        table = DataTable(header=["id", "color"])
+        for i in range(DataTable.DICTIONARY_MIN_ROWS):
+            table.add_row([str(i), "red" if i % 2 else "yellow"])
+        self.assertTrue(table.is_dictionary_encoded("color"))
+
+        out = io.StringIO()
+        table.render(out, mode=ALIGNED)
+        lines = out.getvalue().splitlines()
+        self.assertEqual("id  | color", lines[0])
+        self.assertEqual("0   | yellow", lines[2])
+        self.assertEqual(DataTable.DICTIONARY_MIN_ROWS + 2, len(lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,12 @@
+import gzip
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 from pytql.model import Row, DataTable
-from pytql.tql import RemoteTQL
+from pytql.tql import RemoteTQL, ResultTooLargeError, TQLError
+from tql.rtql import write_db_to_file
 
 """
 Copyright 2019 ThoughtSpot
@@ -58,3 +63,426 @@ class TestRemoteTQL(unittest.TestCase):
         self.assertEqual(3, table.nbr_rows())
 
         self.rtql.run_tql_command("DROP DATABASE foo;")
+
+    def test_head(self):
+        """Tests getting the first rows of a query."""
+        self.rtql.run_tql_command("CREATE DATABASE foo;")
+        self.rtql.run_tql_command("USE foo;")
+        self.rtql.run_tql_command("CREATE TABLE foo (col1 int, col2 varchar(0));")
+        self.rtql.run_tql_command("DELETE FROM foo;")  # make sure empty.
+        for row in range(1, 4): # creates three rows 1-3
+            self.rtql.run_tql_command(f"INSERT INTO foo VALUES ({row}, 'value_{row}');")
+
+        self.assertEqual(2, self.rtql.head("SELECT * FROM foo;", n=2).nbr_rows())
+        self.assertEqual(3, self.rtql.head("SELECT * FROM foo;", n=5).nbr_rows())
+        self.assertEqual(3, self.rtql.execute_tql_query("SELECT * FROM foo;").nbr_rows())  # session still works.
+
+        self.rtql.run_tql_command("DROP DATABASE foo;")
+
+    def test_profile(self):
+        """Tests computing column statistics for a query."""
+        self.rtql.run_tql_command("CREATE DATABASE foo;")
+        self.rtql.run_tql_command("USE foo;")
+        self.rtql.run_tql_command("CREATE TABLE foo (col1 int, col2 varchar(0));")
+        self.rtql.run_tql_command("DELETE FROM foo;")  # make sure empty.
+        for row in range(1, 4): # creates three rows 1-3
+            self.rtql.run_tql_command(f"INSERT INTO foo VALUES ({row}, 'value_{row}');")
+
+        stats = self.rtql.profile("SELECT * FROM foo;")
+        self.assertEqual(3, stats.nbr_rows)
+        self.assertEqual(2.0, stats.get_column("col1").get_mean())
+
+        table = self.rtql.execute_tql_query("SELECT * FROM foo;", stats=True)
+        self.assertEqual("value_1", table.describe().get_row(1).get_column("min"))
+
+        self.rtql.run_tql_command("DROP DATABASE foo;")
+
+
+class TestRemoteTQLExecMode(TestRemoteTQL):
+    """Runs the remote TQL tests with each command in a separate TQL process."""
+
+    def setUp(self) -> None:
+        """Returns a new TQL session in exec mode."""
+        self.rtql = RemoteTQL(hostname=TEST_HOSTNAME, username=TEST_USERNAME, password=TEST_PASSWORD, exec_mode=True)
+
+    def test_database_is_kept(self):
+        """Tests that the database in use is kept between commands."""
+        self.rtql.run_tql_command("CREATE DATABASE foo;")
+        self.rtql.run_tql_command("USE foo;")
+        self.assertEqual("foo", self.rtql.database)
+        self.rtql.run_tql_command("CREATE TABLE foo (col1 int);")
+
+        table = self.rtql.execute_tql_query("SELECT * FROM foo;")
+        self.assertEqual(1, table.nbr_columns())
+
+        self.rtql.run_tql_command("DROP DATABASE foo;")
+
+    def test_partial_command(self):
+        """Tests that commands are collected until they end with a semicolon."""
+        self.assertEqual([], self.rtql.run_tql_command("show"))
+        self.assertEqual("$> ", self.rtql.prompt)
+        self.assertIn("thoughtspot_internal", self.rtql.run_tql_command("databases;"))
+
+
+class TestRemoteTQLCompressed(TestRemoteTQLExecMode):
+    """Runs the remote TQL tests in exec mode with compressed results."""
+
+    def setUp(self) -> None:
+        """Returns a new TQL session in exec mode with compression."""
+        self.rtql = RemoteTQL(hostname=TEST_HOSTNAME, username=TEST_USERNAME, password=TEST_PASSWORD, exec_mode=True,
+                              compress=True)
+
+    def test_metrics(self):
+        """Tests that compressed results are smaller on the wire."""
+        self.rtql.get_databases()
+
+        metrics = self.rtql.get_metrics()
+        self.assertEqual(1, metrics["queries"])
+        self.assertLess(metrics["wire_bytes"], metrics["logical_bytes"])
+
+
+class FakeTQLServer:
+    """Stands in for TQL on the cluster.  Statements are answered from a dictionary of responses."""
+
+    def __init__(self, responses):
+        """Creates a server that answers statement -> (rows, messages, exit status)."""
+        self.responses = responses
+        self.commands = []
+        self.scripts = []
+
+    def run(self, script):
+        """Runs a script in exec mode and returns the output, errors and exit status."""
+        self.scripts.append(script)
+        out, err, status = [], [], 0
+        statement = ""
+        for line in script.split("\n"):
+            statement = f"{statement} {line.strip()}".strip()
+            if not statement.endswith(";"):
+                continue  # statements can span lines.
+            if statement.lower().startswith("use "):
+                err.append("Statement executed successfully.")
+            else:
+                rows, messages, status = self.responses[statement]
+                out.extend(rows)
+                err.extend(messages)
+            statement = ""
+        return ("".join(line + "\n" for line in out).encode("utf-8"),
+                "".join(line + "\n" for line in err).encode("utf-8"), status)
+
+
+class FakeExecChannel:
+    """Stands in for a paramiko channel running a command.  Output is returned a few bytes at a time."""
+
+    CHUNK = 7
+
+    def __init__(self, server):
+        self.server = server
+        self.command = None
+        self.stdin = b""
+        self.exit_status = None
+        self._out = b""
+        self._err = b""
+
+    def exec_command(self, command):
+        self.command = command
+        self.server.commands.append(command)
+
+    def sendall(self, data):
+        self.stdin += data
+
+    def shutdown_write(self):
+        self._out, self._err, self.exit_status = self.server.run(self.stdin.decode("utf-8"))
+        if "| gzip" in self.command:
+            self._out = gzip.compress(self._out)
+            if "pipefail" not in self.command:
+                self.exit_status = 0  # the status of gzip, the last command in the pipe.
+
+    def recv_ready(self):
+        return bool(self._out)
+
+    def recv(self, size):
+        chunk, self._out = self._out[:min(size, self.CHUNK)], self._out[min(size, self.CHUNK):]
+        return chunk
+
+    def recv_stderr_ready(self):
+        return bool(self._err)
+
+    def recv_stderr(self, size):
+        chunk, self._err = self._err[:size], self._err[size:]
+        return chunk
+
+    @property
+    def eof_received(self):
+        return not self._out and not self._err
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+    def close(self):
+        pass
+
+
+class FakeSSHClient:
+    """Stands in for paramiko's SSHClient."""
+
+    server = None
+    shell = None
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def load_system_host_keys(self):
+        pass
+
+    def connect(self, **kwargs):
+        pass
+
+    def get_transport(self):
+        return self
+
+    def set_keepalive(self, interval):
+        pass
+
+    def open_session(self):
+        return FakeExecChannel(FakeSSHClient.server)
+
+    def invoke_shell(self):
+        return FakeSSHClient.shell
+
+    def close(self):
+        pass
+
+
+class TestRemoteTQLOffline(unittest.TestCase):
+    """Tests remote TQL in exec mode against a fake SSH connection."""
+
+    COMPRESS = False
+
+    def setUp(self) -> None:
+        """Returns a new TQL session connected to a fake server."""
+        self.server = FakeTQLServer({
+            "show databases;": (["foo", "bar"], ["Statement executed successfully."], 0),
+            "select * from foo;": (["1|\"a\"", "2|\"b\""],
+                                   ["select * from foo;", "\"col1\"|\"col2\"", "Statement executed successfully."], 0),
+            "script database foo;": (["create database \"foo\";", "use \"foo\";"],
+                                     ["script database foo;", "Statement executed successfully."], 0),
+            "select crash;": ([], ["tql crashed"], 1),
+        })
+        FakeSSHClient.server = self.server
+        self.patcher = mock.patch("pytql.tql.paramiko.SSHClient", FakeSSHClient)
+        self.patcher.start()
+        self.rtql = RemoteTQL(hostname="fake", exec_mode=True, compress=self.COMPRESS)
+
+    def tearDown(self) -> None:
+        """Closes the fake session."""
+        del self.rtql
+        self.patcher.stop()
+
+    def test_get_data(self):
+        """Tests making a data query."""
+        table = self.rtql.execute_tql_query("select * from foo;")
+        self.assertEqual(["col1", "col2"], table.get_header())
+        self.assertEqual(["2", "b"], table.get_row(1).get_data())
+
+    def test_run_tql_command(self):
+        """Tests that the header comes before the rows and the echo of the command is dropped."""
+        self.assertEqual(["\"col1\"|\"col2\"", "1|\"a\"", "2|\"b\"", "Statement executed successfully."],
+                         self.rtql.run_tql_command("select * from foo;"))
+
+    def test_write_db_to_file(self):
+        """Tests that only the script for the database is written by writedb."""
+        filename = os.path.join(tempfile.mkdtemp(), "foo.sql")
+        write_db_to_file(self.rtql, f"writedb foo {filename}")
+        with open(filename) as dbfile:
+            self.assertEqual("create database \"foo\";\nuse \"foo\";\n", dbfile.read())
+
+    def test_max_rows(self):
+        """Tests that a result with more rows than allowed raises an error."""
+        with self.assertRaises(ResultTooLargeError):
+            self.rtql.execute_tql_query("select * from foo;", max_rows=1)
+        self.assertEqual(2, self.rtql.execute_tql_query("select * from foo;", max_rows=2).nbr_rows())
+
+    def test_max_result_bytes(self):
+        """Tests that a result larger than allowed raises an error."""
+        with self.assertRaises(ResultTooLargeError):
+            self.rtql.run_tql_command("select * from foo;", max_result_bytes=len("1|\"a\"\n"))
+        self.assertEqual(2, self.rtql.execute_tql_query("select * from foo;", max_result_bytes=100).nbr_rows())
+
+    def test_exit_status(self):
+        """Tests that a failure without an error message is found from the exit status."""
+        with self.assertRaises(TQLError):
+            self.rtql.run_tql_command("select crash;")
+
+    def test_partial_command(self):
+        """Tests that commands are collected until they end with a semicolon."""
+        self.assertEqual([], self.rtql.run_tql_command("show"))
+        self.assertEqual("$> ", self.rtql.prompt)
+        self.assertEqual([], self.server.scripts)  # nothing sent yet.
+
+        self.assertEqual(["foo", "bar", "Statement executed successfully."], self.rtql.run_tql_command("databases;"))
+        self.assertEqual("rtql [database=none] > ", self.rtql.prompt)
+        self.assertEqual(1, len(self.server.scripts))
+
+    def test_database_is_kept(self):
+        """Tests that the database in use is applied to each new process."""
+        self.rtql.run_tql_command("USE foo;")
+        self.assertEqual("foo", self.rtql.database)
+        self.assertEqual("rtql [database=foo] > ", self.rtql.prompt)
+
+        table = self.rtql.execute_tql_query("select * from foo;")
+        self.assertEqual(2, table.nbr_rows())
+        self.assertEqual("use foo;\nselect * from foo;\n", self.server.scripts[-1])
+
+    def test_database_is_kept_from_query(self):
+        """Tests that a use run as a query also changes the database."""
+        self.rtql.execute_tql_query("use foo;")
+        self.assertEqual("foo", self.rtql.database)
+        self.rtql.execute_tql_query("select * from foo;")
+        self.assertEqual("use foo;\nselect * from foo;\n", self.server.scripts[-1])
+
+
+class TestRemoteTQLOfflineCompressed(TestRemoteTQLOffline):
+    """Tests remote TQL in exec mode with compressed results against a fake SSH connection."""
+
+    COMPRESS = True
+
+    def test_compressed_command(self):
+        """Tests that the results are compressed without hiding TQL's exit status."""
+        self.rtql.get_databases()
+        self.assertTrue(self.server.commands[0].startswith("bash -o pipefail -c "))
+        self.assertIn("| gzip -c -1", self.server.commands[0])
+
+    def test_metrics(self):
+        """Tests that the bytes after decompression, including the end of the stream, are counted."""
+        self.assertEqual(["foo", "bar"], self.rtql.get_databases())
+
+        metrics = self.rtql.get_metrics()
+        self.assertEqual(1, metrics["queries"])
+        self.assertEqual(len(b"foo\nbar\n"), metrics["logical_bytes"])
+        self.assertEqual(len(gzip.compress(b"foo\nbar\n")), metrics["wire_bytes"])
+
+
+class FakeShellChannel:
+    """
+    Stands in for an interactive TQL shell.  Statements are answered from a dictionary of output lines, which can
+    contain PAUSE, where TQL is still working, and DELAY, where TQL has finished but the output hasn't arrived yet.
+    """
+
+    PAUSE = object()
+    DELAY = object()
+
+    def __init__(self, responses, database="foo"):
+        self.responses = responses
+        self.prompt = f"TQL [database={database}]> "
+        self.received = []
+        self._input = ""
+        self._queue = []
+
+    def send(self, data):
+        for char in data:
+            if char == "\x03":
+                self._interrupt()
+            elif char == "\n":
+                self._run(self._input)
+                self._input = ""
+            else:
+                self._input += char
+
+    def _run(self, line):
+        self.received.append(line)
+        self._queue.append(line + "\r\n")
+        if line.startswith("--"):
+            output = []  # comments are ignored.
+        else:
+            output = self.responses.get(line, ["Statement executed successfully."])
+        self._queue.extend(item if item in (self.PAUSE, self.DELAY) else item + "\r\n" for item in output)
+        self._queue.append(self.prompt)
+
+    def _interrupt(self):
+        self.received.append("^C")
+        if self.PAUSE in self._queue:
+            del self._queue[self._queue.index(self.PAUSE):]  # TQL stops the statement.
+            self._queue.append("^C\r\nStatement cancelled.\r\n" + self.prompt)
+        else:
+            self._queue.extend([self.DELAY, "^C\r\n" + self.prompt])  # TQL was already back at the prompt.
+
+    def resume(self):
+        """Lets the next part of the output through, like waiting in select."""
+        if self._queue and self._queue[0] in (self.PAUSE, self.DELAY):
+            del self._queue[0]
+
+    def recv_ready(self):
+        return bool(self._queue) and self._queue[0] not in (self.PAUSE, self.DELAY)
+
+    def recv(self, size):
+        return self._queue.pop(0).encode("utf-8")
+
+
+class TestRemoteTQLOfflineShell(unittest.TestCase):
+    """Tests remote TQL in an interactive shell against a fake SSH connection."""
+
+    HEADER = ["col1 | col2", "-----------"]
+
+    def setUp(self) -> None:
+        """Returns a new TQL session connected to a fake shell."""
+        pause, delay = FakeShellChannel.PAUSE, FakeShellChannel.DELAY
+        self.shell = FakeShellChannel({
+            "tql -script_comments=false": ["Welcome to TQL"],
+            "show databases;": ["foo", "bar", "Statement executed successfully."],
+            "select * from two;": self.HEADER + ["1 | a", "2 | b", delay, "(2 result rows)",
+                                                 "Statement executed successfully."],
+            "select * from many;": self.HEADER + ["1 | a", "2 | b", pause, "3 | c", "(3 result rows)",
+                                                  "Statement executed successfully."],
+            "select * from large;": self.HEADER + [f"{i} | a" for i in range(10)] + [pause] +
+                                    [f"{i} | a" for i in range(10, 20)] + ["(20 result rows)",
+                                                                           "Statement executed successfully."],
+            "select * from nocount;": self.HEADER + ["1 | a", "2 | b", "3 | c", "Statement executed successfully."],
+        })
+        FakeSSHClient.shell = self.shell
+        self.patchers = [mock.patch("pytql.tql.paramiko.SSHClient", FakeSSHClient),
+                         mock.patch("pytql.tql.select.select", lambda r, w, x, t: self.shell.resume())]
+        for patcher in self.patchers:
+            patcher.start()
+        self.rtql = RemoteTQL(hostname="fake")
+
+    def tearDown(self) -> None:
+        """Closes the fake session."""
+        del self.rtql
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_head_cancels_statement(self):
+        """Tests that the statement is cancelled once the rows are read and the session still works."""
+        table = self.rtql.head("select * from many;", n=2)
+        self.assertEqual(2, table.nbr_rows())
+        self.assertIn("^C", self.shell.received)
+        self.assertEqual(["foo", "bar"], self.rtql.get_databases())
+
+    def test_head_interrupt_after_statement_finished(self):
+        """Tests that the output of an interrupt that arrives after the statement finished is drained."""
+        table = self.rtql.head("select * from two;", n=2)
+        self.assertEqual([["1", "a"], ["2", "b"]], [table.get_row(i).get_data() for i in range(2)])
+        self.assertEqual(["foo", "bar"], self.rtql.get_databases())
+        self.assertEqual("foo", self.rtql.database)
+
+    def test_max_rows(self):
+        """Tests that the rest of a result with too many rows is read, but not kept, and the session still works."""
+        with self.assertRaises(ResultTooLargeError):
+            self.rtql.execute_tql_query("select * from large;", max_rows=3)
+        self.assertNotIn("^C", self.shell.received)
+        self.assertEqual(["foo", "bar"], self.rtql.get_databases())
+        self.assertEqual("foo", self.rtql.database)
+
+        self.assertEqual(20, self.rtql.execute_tql_query("select * from large;", max_rows=20).nbr_rows())
+
+    def test_max_rows_without_row_count(self):
+        """Tests that the rows are counted correctly for statements that don't print how many rows there are."""
+        with self.assertRaises(ResultTooLargeError):
+            self.rtql.execute_tql_query("select * from nocount;", max_rows=2)
+        self.assertEqual(3, self.rtql.execute_tql_query("select * from nocount;", max_rows=3).nbr_rows())
+
+    def test_max_result_bytes(self):
+        """Tests that a result larger than allowed raises an error and the session still works."""
+        with self.assertRaises(ResultTooLargeError):
+            self.rtql.run_tql_command("select * from large;", max_result_bytes=100)
+        self.assertEqual(["foo", "bar"], self.rtql.get_databases())
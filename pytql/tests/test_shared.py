@@ -0,0 +1,78 @@
+import subprocess
+import sys
+import unittest
+
+from pytql.model import DataTable
+from pytql.shared import map_row_ranges
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+def count_failed(table, start, stop):
+    """Counts the failed rows in a range.  Used by map_row_ranges, so has to be picklable."""
+    return sum(1 for row_number in range(start, stop) if table.get_row(row_number)["status"] == "failed")
+
+
+class TestSharedDataTable(unittest.TestCase):
+    """Tests sharing tables with shared memory."""
+
+    def setUp(self) -> None:
+        nbr_rows = DataTable.DICTIONARY_MIN_ROWS * 2
+        self.table = DataTable(header=["status", "id"], data=[["ok" if i % 4 else "failed", str(i)]
+                                                              for i in range(nbr_rows)])
+
+    def test_attach(self):
+        """Tests that an attached table has the same data."""
+        with self.table.to_shared() as shared:
+            table = DataTable.attach(shared.name)
+            self.assertEqual(self.table.get_header(), table.get_header())
+            self.assertEqual(self.table.nbr_rows(), table.nbr_rows())
+            self.assertEqual(self.table.get_column("status"), table.get_column("status"))
+            self.assertEqual(self.table.get_column("id"), table.get_column("id"))
+            self.assertTrue(table.is_dictionary_encoded("status"))
+            self.assertEqual(self.table.value_counts("status"), table.value_counts("status"))
+            self.assertEqual(["failed", "0"], table.get_row(0).get_data())
+
+            with self.assertRaises(ValueError):
+                table.add_row(["ok", "x"])
+            del table
+
+    def test_attach_from_another_program(self):
+        """Tests that a program that attaches to a table doesn't free it when it exits."""
+        with self.table.to_shared() as shared:
+            code = f"from pytql.model import DataTable; print(DataTable.attach({shared.name!r}).nbr_rows())"
+            result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    universal_newlines=True, check=True)
+            self.assertEqual(str(self.table.nbr_rows()), result.stdout.strip())
+            self.assertNotIn("leaked", result.stderr)
+
+            table = DataTable.attach(shared.name)  # still there.
+            self.assertEqual(self.table.nbr_rows(), table.nbr_rows())
+            del table
+
+    def test_only_text(self):
+        """Tests that tables with values that aren't text can't be shared."""
+        with self.assertRaises(TypeError):
+            DataTable(header=["col1"], data=[[1]]).to_shared()
+
+    def test_map_row_ranges(self):
+        """Tests processing row ranges in other processes."""
+        results = map_row_ranges(self.table, count_failed, processes=2, chunk_size=300)
+
+        self.assertEqual(7, len(results))
+        self.assertEqual(self.table.value_counts("status")["failed"], sum(results))
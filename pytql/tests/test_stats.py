@@ -0,0 +1,95 @@
+import random
+import unittest
+
+from pytql.stats import ColumnStats, HyperLogLog, QuantileSketch, TableStats
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+class TestStats(unittest.TestCase):
+    """Tests the statistics and sketches."""
+
+    def test_hyperloglog(self):
+        """Tests estimating the number of distinct values."""
+        for count in (10, 1000, 100000):
+            hll = HyperLogLog()
+            for i in range(count):
+                hll.add(str(i))
+                hll.add(str(i))  # duplicates don't count.
+            self.assertAlmostEqual(count, hll.estimate(), delta=count * 0.05)
+
+    def test_quantile_sketch(self):
+        """Tests estimating quantiles with bounded memory."""
+        values = list(range(100000))
+        random.Random(1).shuffle(values)
+        sketch = QuantileSketch(seed=1)
+        for value in values:
+            sketch.add(value)
+
+        self.assertEqual(100000, sketch.count)
+        self.assertLess(sum(len(level) for level in sketch._levels), 3 * sketch.k)  # memory is bounded.
+        for fraction, estimate in zip((0.1, 0.5, 0.9), sketch.quantiles([0.1, 0.5, 0.9])):
+            self.assertAlmostEqual(fraction * 100000, estimate, delta=100000 * 0.02)
+
+    def test_empty_quantile_sketch(self):
+        """Tests the quantiles of an empty sketch."""
+        self.assertEqual([None, None], QuantileSketch().quantiles([0.25, 0.75]))
+
+    def test_numeric_column(self):
+        """Tests the statistics for a column of numbers with nulls."""
+        stats = ColumnStats("col1")
+        for value in ["3", "1.5", "", "{null}", None, "10"]:
+            stats.add(value)
+
+        self.assertTrue(stats.is_numeric())
+        self.assertEqual(3, stats.count)
+        self.assertEqual(3, stats.nulls)
+        self.assertEqual("1.5", stats.get_min())  # compared as numbers, not text.
+        self.assertEqual("10", stats.get_max())
+        self.assertAlmostEqual(14.5 / 3, stats.get_mean())
+        self.assertEqual([3.0], stats.get_quantiles([0.5]))
+
+    def test_text_column(self):
+        """Tests the statistics for a column of text."""
+        stats = ColumnStats("col1")
+        for value in ["3", "b", "10", "a"]:
+            stats.add(value)
+
+        self.assertFalse(stats.is_numeric())
+        self.assertEqual("10", stats.get_min())
+        self.assertEqual("b", stats.get_max())
+        self.assertIsNone(stats.get_mean())
+        self.assertEqual({"column": "col1", "count": 4, "nulls": 0, "distinct": 4, "min": "10", "max": "b",
+                          "mean": None, "p25": None, "p50": None, "p75": None}, stats.summary())
+
+    def test_table_stats(self):
+        """Tests the statistics for each column of a table."""
+        stats = TableStats()
+        stats.add_row(["1", "a"])
+        stats.add_row(["2", ""])
+
+        self.assertEqual(2, stats.nbr_rows)
+        self.assertEqual(["0", "1"], [column.name for column in stats.columns])  # named from the first row.
+        self.assertEqual(1, stats.get_column(1).nulls)
+        self.assertEqual(2, stats.get_column("0").count)
+        with self.assertRaises(ValueError):
+            stats.get_column("missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
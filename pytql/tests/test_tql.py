@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+from pytql.tql import ResultTooLargeError, TQL
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+# Stands in for TQL.  Reads the query, writes the header to standard error and many rows to standard out.
+FAKE_TQL_COMMAND = "sh -c 'cat > /dev/null; echo col1 >&2; seq 1 100000'"
+
+
+class TestTQL(unittest.TestCase):
+    """Tests running TQL locally against a command that stands in for TQL."""
+
+    def setUp(self) -> None:
+        """Replaces the TQL command."""
+        self.patcher = mock.patch.object(TQL, "COMMAND", FAKE_TQL_COMMAND)
+        self.patcher.start()
+        self.tql = TQL()
+
+    def tearDown(self) -> None:
+        """Puts back the TQL command."""
+        self.patcher.stop()
+
+    def test_execute_tql_query(self):
+        """Tests that the rows and header are read."""
+        table = self.tql.execute_tql_query("select * from foo;")
+        self.assertEqual(["col1"], table.get_header())
+        self.assertEqual(100000, table.nbr_rows())
+
+    def test_max_rows(self):
+        """Tests that a result with more rows than allowed raises an error."""
+        with self.assertRaises(ResultTooLargeError) as context:
+            self.tql.execute_tql_query("select * from foo;", max_rows=1000)
+        self.assertIn("max_rows=1000", str(context.exception))
+        self.assertEqual(100000, self.tql.execute_tql_query("select * from foo;", max_rows=100000).nbr_rows())
+
+    def test_max_result_bytes(self):
+        """Tests that a result larger than allowed raises an error."""
+        with self.assertRaises(ResultTooLargeError) as context:
+            self.tql.run_tql_command("select * from foo;", max_result_bytes=1000)
+        self.assertIn("max_result_bytes=1000", str(context.exception))
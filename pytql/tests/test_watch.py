@@ -0,0 +1,153 @@
+import unittest
+from unittest import mock
+
+from pytql.model import DataTable
+from pytql.tql import TQL
+from pytql.watch import ResultWatcher
+
+"""
+Copyright 2019 ThoughtSpot
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+class TestResultWatcher(unittest.TestCase):
+    """Tests the ResultWatcher class."""
+
+    HEADER = ["name", "status"]
+
+    def _table(self, data):
+        return DataTable(header=self.HEADER, data=data)
+
+    def test_first_snapshot_is_inserted(self):
+        """Tests that all rows of the first snapshot are inserted."""
+        delta = ResultWatcher().update(self._table([["a", "ok"], ["b", "ok"]]))
+        self.assertEqual([["a", "ok"], ["b", "ok"]], delta.inserted)
+        self.assertEqual([], delta.deleted)
+
+    def test_unkeyed_changes(self):
+        """Tests that without a key a changed row is a delete and an insert."""
+        watcher = ResultWatcher()
+        watcher.update(self._table([["a", "ok"], ["b", "ok"], ["b", "ok"]]))
+
+        self.assertTrue(watcher.update(self._table([["b", "ok"], ["a", "ok"], ["b", "ok"]])).is_empty())
+
+        delta = watcher.update(self._table([["a", "failed"], ["b", "ok"]]))
+        self.assertEqual([["a", "failed"]], delta.inserted)
+        self.assertEqual([["b", "ok"], ["a", "ok"]], delta.deleted)
+        self.assertEqual([], delta.changed)
+
+    def test_keyed_changes(self):
+        """Tests that with a key changed rows are reported."""
+        watcher = ResultWatcher(key=["name"])
+        watcher.update(self._table([["a", "ok"], ["b", "ok"]]))
+
+        delta = watcher.update(self._table([["a", "failed"], ["c", "ok"]]))
+        self.assertEqual([["c", "ok"]], delta.inserted)
+        self.assertEqual([["b", "ok"]], delta.deleted)
+        self.assertEqual([(["a", "ok"], ["a", "failed"])], delta.changed)
+        self.assertEqual("+ c|ok\n- b|ok\n~ a|ok -> a|failed", str(delta))
+
+    def test_duplicate_keys(self):
+        """Tests that several rows with the same key are tracked separately."""
+        watcher = ResultWatcher(key=["name"])
+        watcher.update(self._table([["a", "ok"], ["a", "x"]]))
+
+        delta = watcher.update(self._table([["a", "changed"], ["a", "x"]]))
+        self.assertEqual([(["a", "ok"], ["a", "changed"])], delta.changed)
+        self.assertEqual([], delta.inserted)
+        self.assertEqual([], delta.deleted)
+
+        delta = watcher.update(self._table([["a", "x"]]))
+        self.assertEqual([["a", "changed"]], delta.deleted)
+        self.assertEqual([], delta.changed)
+
+    def test_header_change(self):
+        """Tests that all rows are replaced if the columns change."""
+        watcher = ResultWatcher()
+        watcher.update(self._table([["a", "ok"]]))
+
+        delta = watcher.update(DataTable(header=["name"], data=[["a"]]))
+        self.assertEqual([["a"]], delta.inserted)
+        self.assertEqual([["a", "ok"]], delta.deleted)
+
+    def test_header_change_with_key(self):
+        """Tests that all keyed rows are replaced if the columns change."""
+        watcher = ResultWatcher(key=["name"])
+        watcher.update(self._table([["a", "ok"], ["a", "x"], ["b", "ok"]]))
+
+        delta = watcher.update(DataTable(header=["name", "status", "count"], data=[["a", "ok", "1"]]))
+        self.assertEqual([["a", "ok", "1"]], delta.inserted)
+        self.assertEqual([["a", "ok"], ["a", "x"], ["b", "ok"]], delta.deleted)
+        self.assertEqual([], delta.changed)
+
+
+class SnapshotTQL(TQL):
+    """Stands in for TQL.  Each query returns the next snapshot and takes a second on a fake clock."""
+
+    def __init__(self, snapshots, clock):
+        super(SnapshotTQL, self).__init__()
+        self.snapshots = list(snapshots)
+        self.clock = clock
+
+    def execute_tql_query(self, query, max_rows=None, max_result_bytes=None, stats=False):
+        self.clock.now += 1
+        return DataTable(header=["name", "status"], data=self.snapshots.pop(0))
+
+
+class FakeClock:
+    """Stands in for the time module so that watching doesn't wait."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestWatch(unittest.TestCase):
+    """Tests TQL.watch()."""
+
+    def test_watch(self):
+        """Tests that runs without changes are skipped and the runs are spaced by the interval."""
+        clock = FakeClock()
+        tql = SnapshotTQL([[["a", "ok"]], [["a", "ok"]], [["a", "failed"]]], clock)
+
+        with mock.patch("pytql.tql.time", clock):
+            deltas = list(tql.watch("select * from loads;", interval=5, iterations=3))
+
+        self.assertEqual(2, len(deltas))
+        self.assertEqual([["a", "ok"]], deltas[0].inserted)
+        self.assertEqual([["a", "failed"]], deltas[1].inserted)
+        self.assertEqual([["a", "ok"]], deltas[1].deleted)
+        self.assertEqual([4, 4], clock.sleeps)  # no sleep after the last run.
+        self.assertEqual([], tql.snapshots)
+
+    def test_watch_first_run_is_yielded(self):
+        """Tests that the first run is yielded even if it has no rows."""
+        clock = FakeClock()
+        tql = SnapshotTQL([[], []], clock)
+
+        with mock.patch("pytql.tql.time", clock):
+            deltas = list(tql.watch("select * from loads;", interval=0.5, key=["name"], iterations=2))
+
+        self.assertEqual(1, len(deltas))
+        self.assertTrue(deltas[0].is_empty())
+        self.assertEqual([0.0], clock.sleeps)  # the query took longer than the interval.
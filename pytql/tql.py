@@ -1,14 +1,20 @@
+import codecs
 import logging
 import os
 import paramiko
 import re
+import select
 import socket
 import sys
 import shlex
 import subprocess
+import tempfile
 import time
+import zlib
 
 from .model import DataTable
+from .stats import TableStats
+from .watch import ResultWatcher
 
 """
 Copyright 2019 ThoughtSpot
@@ -38,6 +44,86 @@ def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
+class TQLError(Exception):
+    """
+    Raised when TQL reports an error running a command.
+    """
+    pass
+
+
+class ResultTooLargeError(Exception):
+    """
+    Raised when a result is larger than the limits given for it.  Reading stops as soon as a limit is passed.
+    """
+    pass
+
+
+class _ResultGuard:
+    """
+    Counts the rows and bytes of a result as it's read and checks them against the limits.
+    """
+
+    def __init__(self, max_rows=None, max_result_bytes=None, extra_lines=0):
+        """
+        Creates a new guard.
+        :param max_rows: The most rows allowed, or None for no limit.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes allowed, or None for no limit.
+        :type max_result_bytes: int
+        :param extra_lines: The number of lines in the output that aren't rows, e.g. the header.
+        :type extra_lines: int
+        """
+        self.max_rows = max_rows
+        self.max_result_bytes = max_result_bytes
+        self.rows = -extra_lines
+        self.nbr_bytes = 0
+
+    def add(self, data):
+        """
+        Counts more of the result.
+        :param data: The data that was read.
+        :type data: bytes or str
+        """
+        self.nbr_bytes += len(data)
+        self.rows += data.count("\n" if isinstance(data, str) else b"\n")
+
+    def exceeded(self):
+        """
+        Returns True if a limit has been passed.
+        :return: True if the result is too large.
+        :rtype: bool
+        """
+        return (self.max_rows is not None and self.rows > self.max_rows) or \
+               (self.max_result_bytes is not None and self.nbr_bytes > self.max_result_bytes)
+
+    def error(self):
+        """
+        Returns the error to raise for a result that is too large.
+        :return: The error.
+        :rtype: ResultTooLargeError
+        """
+        if self.max_rows is not None and self.rows > self.max_rows:
+            return ResultTooLargeError(f"Result has more than max_rows={self.max_rows} rows.")
+        return ResultTooLargeError(f"Result has more than max_result_bytes={self.max_result_bytes} bytes.")
+
+
+def _truncate_lines(data, nbr_lines):
+    """
+    Returns the start of the data up to and including the given number of newlines.
+    :param data: The data to truncate.
+    :type data: bytes or str
+    :param nbr_lines: The number of lines to keep.
+    :type nbr_lines: int
+    :return: The first lines of the data.
+    :rtype: bytes or str
+    """
+    newline = "\n" if isinstance(data, str) else b"\n"
+    end = 0
+    for _ in range(nbr_lines):
+        end = data.index(newline, end) + 1
+    return data[:end]
+
+
 class TQL:
     """
     Wraps the TQL interface.  Note that this class expects to run on the ThoughtSpot cluster and have tql in the path.
@@ -45,10 +131,16 @@ class TQL:
 
     COLUMN_SEPARATOR = "|"  # TQL uses pipes to separate output columns.
     COMMAND = "/usr/local/scaligent/release/bin/tql -query_results_apply_top_row_count=-1"
+    BUFFER_SIZE = 65536  # bytes to read from TQL at a time.
+    TOP_ROW_COUNT_FLAG = "-query_results_apply_top_row_count"  # limits the rows TQL returns.
 
     # TQL specific queries.
     SHOW_DATABASES = "show databases;"
 
+    # Messages TQL writes after a statement that aren't part of the results.
+    STATUS_MESSAGES = ("Statement executed successfully",)
+    ERROR_TEXT = "error="  # in the messages TQL writes for errors.
+
     def __init__(self):
         """
         Creates a new TQL interface.
@@ -69,22 +161,114 @@ class TQL:
 
         return tables
 
-    def execute_tql_query(self, query):
+    def execute_tql_query(self, query, max_rows=None, max_result_bytes=None, stats=False):
         """
         Executes a TQL query and returns the data as a data table.
         :param query: A complete query to send to TQL.
         :type query: str
+        :param max_rows: If set, stops reading and raises an error if there are more rows than this.
+        :type max_rows: int
+        :param max_result_bytes: If set, stops reading and raises an error if the result is larger than this.
+        :type max_result_bytes: int
+        :param stats: If True, column statistics are computed while the rows are parsed, see DataTable.describe().
+        :type stats: bool
+        :return: A data table with the results.
+        :rtype: DataTable
+        :raises: ResultTooLargeError if the result is larger than the limits.
+        """
+        header, rows = self._query_rows(query, max_rows=max_rows, max_result_bytes=max_result_bytes)
+        table = DataTable(header=header, stats=stats)
+        for row in rows:
+            table.add_row(row=row)
+        return table
+
+    def profile(self, query, max_rows=None, max_result_bytes=None):
+        """
+        Executes a TQL query and returns statistics for each column without keeping the rows.  Use this to profile
+        tables that are too large to hold as a data table.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param max_rows: If set, stops reading and raises an error if there are more rows than this.
+        :type max_rows: int
+        :param max_result_bytes: If set, stops reading and raises an error if the result is larger than this.
+        :type max_result_bytes: int
+        :return: The statistics for each column.
+        :rtype: TableStats
+        :raises: ResultTooLargeError if the result is larger than the limits.
+        """
+        header, rows = self._query_rows(query, max_rows=max_rows, max_result_bytes=max_result_bytes)
+        stats = TableStats(header=header)
+        for row in rows:
+            stats.add_row(row)
+        return stats
+
+    def _query_rows(self, query, max_rows=None, max_result_bytes=None):
+        """
+        Executes a TQL query and returns the header and the parsed rows.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param max_rows: The most rows to read before raising an error.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes to read before raising an error.
+        :type max_result_bytes: int
+        :return: The header and a generator of the rows, which are parsed as they are read.
+        :rtype: list of str, generator of list of str
+        :raises: ResultTooLargeError if the result is larger than the limits.
+        """
+        out, err = self._execute_query(query=query, max_rows=max_rows, max_result_bytes=max_result_bytes)
+        return self._parse_output(query=query, out=out, err=err)
+
+    def head(self, query, n=10):
+        """
+        Executes a TQL query and returns only the first rows.  Reading stops and TQL is stopped as soon as the rows
+        have been read, so previews of large tables are quick.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param n: The number of rows to return.
+        :type n: int
+        :return: A data table with up to n rows.
+        :rtype: DataTable
+        """
+        out, err = self._execute_query(query=query, row_limit=n)
+        return self._build_table(query=query, out=out, err=err)
+
+    @staticmethod
+    def _build_table(query, out, err):
+        """
+        Creates a data table from the output of a query.
+        :param query: The query that was run.
+        :type query: str
+        :param out: The standard out from TQL, which has the rows.
+        :type out: list of str
+        :param err: The standard error from TQL, which has the header.
+        :type err: list of str
         :return: A data table with the results.
         :rtype: DataTable
         """
-        out, err = self._execute_query(query=query)
+        header, rows = TQL._parse_output(query=query, out=out, err=err)
+        table = DataTable(header=header)
+        for row in rows:
+            table.add_row(row=row)
 
-        table = DataTable()
+        return table
 
+    @staticmethod
+    def _parse_output(query, out, err):
+        """
+        Parses the output of a query.
+        :param query: The query that was run.
+        :type query: str
+        :param out: The standard out from TQL, which has the rows.
+        :type out: list of str
+        :param err: The standard error from TQL, which has the header.
+        :type err: list of str
+        :return: The header and a generator of the rows.
+        :rtype: list of str, generator of list of str
+        """
         # The header should be in the first row that contains pipes.
         header = None
         for line in err:
-            if query in line:
+            if query in line or line.startswith(TQL.STATUS_MESSAGES):
                 continue
 
             # The first line is the command.  The next line is the header.
@@ -96,28 +280,104 @@ class TQL:
             header = list(splitter)
             break
 
-        if header:
-            table._header = header
+        def rows():
+            for line in out:
+                splitter = shlex.shlex(line, posix=True)
+                splitter.whitespace = TQL.COLUMN_SEPARATOR
+                splitter.whitespace_split = True
+                splitter.commenters = ''
+                splitter.quotes = '"'
+                yield list(splitter)
 
-        for line in out:
-            splitter = shlex.shlex(line, posix=True)
-            splitter.whitespace = TQL.COLUMN_SEPARATOR
-            splitter.whitespace_split = True
-            splitter.commenters = ''
-            splitter.quotes = '"'
-            data = list(splitter)
-            table.add_row(row=data)
+        return header, rows()
 
-        return table
+    def watch(self, query, interval=5, key=None, iterations=None):
+        """
+        Runs a query repeatedly and yields the rows that changed since the last run.  The first result yields all
+        rows as inserted.  Runs where nothing changed aren't yielded.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param interval: Seconds between the start of each run.
+        :type interval: float
+        :param key: Names or indexes of the columns that identify a row, so changed rows can be reported.
+        :type key: list of str or int
+        :param iterations: The number of times to run the query.  Runs until stopped if not set.
+        :type iterations: int
+        :return: The changes for each run.
+        :rtype: iterator of ResultDelta
+        """
+        watcher = ResultWatcher(key=key)
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            start = time.time()
+            delta = watcher.update(self.execute_tql_query(query))
+            if iteration == 0 or not delta.is_empty():
+                yield delta
+
+            iteration += 1
+            if iterations is None or iteration < iterations:
+                time.sleep(max(0.0, interval - (time.time() - start)))
+
+    def run_tql_command(self, command, max_rows=None, max_result_bytes=None):
+        """
+        Runs a command in TQL and returns the results as a list of strings.
+        :param command: The command to run.
+        :type command: str
+        :param max_rows: If set, stops reading and raises an error if there are more rows than this.
+        :type max_rows: int
+        :param max_result_bytes: If set, stops reading and raises an error if the result is larger than this.
+        :type max_result_bytes: int
+        :return: The header, the data from the command and then any messages from TQL, like the TQL shell shows them.
+        :rtype: list of str
+        :raises: TQLError if TQL reports an error, ResultTooLargeError if the result is larger than the limits.
+        """
+        out, err = self._execute_query(query=command, max_rows=max_rows, max_result_bytes=max_result_bytes)
+        return self._order_output(query=command, out=out, err=err)
 
     @staticmethod
-    def _execute_query(query):
+    def _order_output(query, out, err):
+        """
+        Puts the output of a command in the order the TQL shell shows it.  TQL writes the rows to standard out and
+        the echo of the command, the header and the messages to standard error.
+        :param query: The command that was run.
+        :type query: str
+        :param out: The standard out from TQL, which has the rows.
+        :type out: list of str
+        :param err: The standard error from TQL, which has the header and messages.
+        :type err: list of str
+        :return: The header, the rows and then the messages, without the echo of the command.
+        :rtype: list of str
+        """
+        command_lines = [line.strip() for line in query.strip().split("\n")]
+        echoes = set(command_lines) | {" ".join(command_lines)}
+
+        header = []
+        messages = []
+        for line in err:
+            if line.strip() in echoes:
+                continue
+            if line.startswith(TQL.STATUS_MESSAGES):
+                messages.append(line)
+            else:
+                header.append(line)
+
+        return header + out + messages
+
+    @staticmethod
+    def _execute_query(query, max_rows=None, max_result_bytes=None, row_limit=None):
         """
         Executes the query and returns the standard out and standard error received from TQL.
         :param query: The query to execute.
         :type query: str
+        :param max_rows: The most rows to read before raising an error.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes to read before raising an error.
+        :type max_result_bytes: int
+        :param row_limit: If set, only this many rows are returned and TQL is stopped once they have been read.
+        :type row_limit: int
         :return: The results of the query.
         :rtype list of str,str
+        :raises: TQLError, ResultTooLargeError
         """
         # TODO add more error checking.
         query = query.strip()
@@ -126,18 +386,41 @@ class TQL:
         if not query.endswith(';'):
             query += ";"
 
-        tql_file = "/tmp/tql.%s" % time.time()
-        with open(tql_file, "w") as cmdfile:
+        # each query gets its own file so that queries can run concurrently.
+        fd, tql_file = tempfile.mkstemp(prefix="tql.")
+        with os.fdopen(fd, "w") as cmdfile:
             cmdfile.write(query)
 
         command = "cat '" + tql_file + "' | " + TQL.COMMAND
+        if row_limit is not None:
+            command += f" {TQL.TOP_ROW_COUNT_FLAG}={row_limit}"  # the last flag wins.
         logging.debug(command)
 
-        proc = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
-        out, err = proc.communicate()
-
-        os.remove(tql_file)  # bit of cleanup.
+        # Results are read as they come so that reading can stop if they get too large.
+        guard = _ResultGuard(max_rows=max_rows, max_result_bytes=max_result_bytes)
+        out = bytearray()
+        with tempfile.TemporaryFile() as errfile:
+            proc = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=errfile)
+            try:
+                for chunk in iter(lambda: proc.stdout.read1(TQL.BUFFER_SIZE), b""):
+                    guard.add(chunk)
+                    if guard.exceeded():
+                        proc.kill()
+                        raise guard.error()
+                    out += chunk
+                    if row_limit is not None and guard.rows >= row_limit:
+                        out = _truncate_lines(out, row_limit)
+                        proc.kill()  # don't need the rest.
+                        break
+            finally:
+                proc.stdout.close()
+                proc.wait()
+                os.remove(tql_file)  # bit of cleanup.
+
+            errfile.seek(0)
+            err = errfile.read()
+        out = bytes(out)
 
         logging.debug("==================================================================")
         logging.debug(out)
@@ -145,49 +428,103 @@ class TQL:
         logging.debug(err)
         logging.debug("==================================================================")
 
-        # This isn't perfect if there is an error that doesn't have the text "error=" in it.
-        if "error=" in err:
-            raise Exception("Error from TQL: %s", err)
+        stdout = TQL._split_output(out)
+        stderr = TQL._split_output(err)
+        TQL._check_for_errors(stderr)
 
-        stdout = out.decode("utf-8", "ignore").split('\n')
-        # usually get a blank line that isn't needed.
-        try:
-            stdout.remove('')
-        except ValueError:
-            pass  # might not be there.
+        return stdout, stderr
 
-        stderr = err.decode("utf-8", "ignore").split('\n')
+    @staticmethod
+    def _split_output(output):
+        """
+        Decodes output from TQL and splits it into lines.
+        :param output: The output from TQL.
+        :type output: bytes
+        :return: The lines of output.
+        :rtype: list of str
+        """
+        lines = output.decode("utf-8", "ignore").replace("\r", "").split('\n')
         # usually get a blank line that isn't needed.
         try:
-            stderr.remove('')
+            lines.remove('')
         except ValueError:
             pass  # might not be there.
 
-        return stdout, stderr
+        return lines
+
+    @staticmethod
+    def _check_for_errors(stderr, exit_status=0):
+        """
+        Raises an exception if TQL reported an error.
+        :param stderr: The lines TQL wrote to standard error.
+        :type stderr: list of str
+        :param exit_status: The exit status of TQL, if known.
+        :type exit_status: int
+        :raises: TQLError
+        """
+        # This isn't perfect if there is an error that doesn't have the text "error=" in it.
+        if exit_status or any(TQL.ERROR_TEXT in line for line in stderr):
+            raise TQLError("Error from TQL: %s" % "\n".join(stderr))
 
 
 class RemoteTQL(TQL):
     """
-    Provides a remote access to TQL via an SSH session.
+    Provides a remote access to TQL via an SSH session.  By default TQL is run in an interactive shell.  In exec mode
+    each command runs in its own non-interactive TQL process, which avoids parsing prompts and keeps the output and
+    error streams separate.
     """
 
-    def __init__(self, hostname, username=None, password=None, **kwargs):
+    EXEC_COMMAND = "tql -script_comments=false -query_results_apply_top_row_count=-1"
+    COMPRESS_COMMAND = "gzip -c -1"  # compresses results on the server in exec mode.
+    RESULT_EXTRA_LINES = 5  # most lines in the shell output that aren't rows: command, header, divider, count, status.
+    PROMPT_WINDOW = 1024  # characters kept to look for the prompt while discarding a result.
+    SHELL_HEADER_LINES = 3  # lines in the shell output before the rows: command, header, divider.
+    INTERRUPT = "\x03"  # Ctrl-C, cancels the running statement.
+    INTERRUPT_TIMEOUT = 30  # seconds to wait for the prompt after cancelling a statement.
+    DRAIN_MARKER = "-- rtql drain"  # comment sent after an interrupt to find the end of the output it caused.
+
+    def __init__(self, hostname, username=None, password=None, keepalive=None, exec_mode=False, compress=False,
+                 **kwargs):
         """
         Creates a remote session to TQL.
+        :param hostname: IP or host name for ThoughtSpot.
+        :type hostname: str
+        :param username: The user to log in as.
+        :type username: str
+        :param password: The password for the user.
+        :type password: str
+        :param keepalive: If set, sends an SSH keepalive every keepalive seconds so idle sessions stay open.
+        :type keepalive: int
+        :param exec_mode: If True, runs each command with a separate TQL process instead of an interactive shell.
+        :type exec_mode: bool
+        :param compress: If True, turns on SSH compression.  In exec mode results are also compressed on the server.
+        :type compress: bool
+        :param kwargs: Other arguments to pass to paramiko's connect.
         """
         print(f"Starting remote TQL to host {hostname}")
 
         self.prompt = None # nice prompt to use.
+        self.database = None  # database currently in use, based on the prompt.
         self._set_prompt(database="none")
         self.hostname = hostname
 
         self.__ssh_client = paramiko.SSHClient()
         self.__ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self.__ssh_client.load_system_host_keys()
-        self.__ssh_client.connect(hostname=hostname, username=username, password=password, timeout=10, **kwargs)
-
-        self._channel = self.__ssh_client.invoke_shell()
-        self._connect_to_tql()
+        self.__ssh_client.connect(hostname=hostname, username=username, password=password, timeout=10,
+                                  compress=compress, **kwargs)
+        if keepalive:
+            self.__ssh_client.get_transport().set_keepalive(keepalive)
+
+        self._exec_mode = exec_mode
+        self._compress = compress
+        self._metrics = {"queries": 0, "wire_bytes": 0, "logical_bytes": 0}
+        self._partial_command = ""  # statement being built up in exec mode.
+        if exec_mode:
+            self._channel = None
+        else:
+            self._channel = self.__ssh_client.invoke_shell()
+            self._connect_to_tql()
 
         super(RemoteTQL, self).__init__()
 
@@ -199,6 +536,27 @@ class RemoteTQL(TQL):
         print(f"{self.prompt} closing connection to {self.hostname}")
         self.__ssh_client.close()
 
+    def is_active(self):
+        """
+        Returns True if the SSH session and the TQL shell are still open.
+        :return: True if commands can still be sent.
+        :rtype: bool
+        """
+        transport = self.__ssh_client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+
+        return self._exec_mode or not self._channel.closed
+
+    def get_metrics(self):
+        """
+        Returns the counts of data received from TQL.
+        :return: A dictionary with the number of queries sent, the bytes of results received over SSH (before the
+        SSH layer's own compression) and the bytes of results after decompression.
+        :rtype: dict
+        """
+        return dict(self._metrics)
+
     def _set_prompt(self, partial=False, database=None, data=None):
 
         if partial:
@@ -207,12 +565,13 @@ class RemoteTQL(TQL):
             if database:
                 pass  # use the database, but don't do other checks.
             elif data:
-                m = re.search("\[database=(.*)\]", data)
+                m = re.search(r"\[database=(.*)\]", data)
                 if m:
                     database = m.group(1)
             else:
                 database = "none"
 
+            self.database = database if database != "none" else None
             self.prompt = f"rtql [database={database}] > "
 
     def _connect_to_tql(self):
@@ -226,65 +585,342 @@ class RemoteTQL(TQL):
         response = self._get_tql_response()
         print("\n".join(response))
 
-    def run_tql_command(self, command):
+    def run_tql_command(self, command, max_rows=None, max_result_bytes=None):
         """
         Runs a command in TQL and returns the results as a list of strings..
         :param command: The command to run.
         :type command: str
+        :param max_rows: If set, stops keeping the results and raises an error if there are more rows than this.
+        :type max_rows: int
+        :param max_result_bytes: If set, stops keeping the results and raises an error if they are larger than this.
+        :type max_result_bytes: int
         :return: The data from the command as a list.
         :rtype: list of str
+        :raises: ResultTooLargeError if the result is larger than the limits.
         """
+        if self._exec_mode:
+            return self._run_exec_command(command, max_rows=max_rows, max_result_bytes=max_result_bytes)
+
         self._channel.send(command)
         self._channel.send("\n")
+        self._metrics["queries"] += 1
 
-        return self._get_tql_response()
+        return self._get_tql_response(max_rows=max_rows, max_result_bytes=max_result_bytes)
 
-    def _get_tql_response(self):
+    def _get_tql_response(self, max_rows=None, max_result_bytes=None, row_limit=None):
         """
-        Waits for a response to a command and returns as a list.  The TQL prompt is not returned.
+        Waits for a response to a command and returns as a list.  The TQL prompt is not returned.  If the response is
+        larger than the limits the rest of it is read up to the prompt, but not kept, so the session can still be
+        used.  While reading, every line that might not be a row is allowed for, so the rows are counted again once
+        the whole response has been read.
+        :param max_rows: The most rows to keep before raising an error.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes to keep before raising an error.
+        :type max_result_bytes: int
+        :param row_limit: If set, the statement is cancelled once this many rows have been read and only those rows
+        are returned.
+        :type row_limit: int
         :return: The list of values back from TQL.
         :rtype: list of str
+        :raises: ResultTooLargeError, or TQLError if TQL doesn't return to the prompt after cancelling.
         """
+        guard = _ResultGuard(max_rows=max_rows, max_result_bytes=max_result_bytes,
+                             extra_lines=RemoteTQL.RESULT_EXTRA_LINES)
+        decoder = codecs.getincrementaldecoder("utf-8")("ignore")
         data = ""
+        lines = 0
+        result = None  # the part of the data to return if the statement was cancelled.
+        interrupted_at = None
+        too_large = False
         full_command = False
         partial_command = False
         while (not full_command) and (not partial_command):
 
             while self._channel.recv_ready():
-                data += str(self._channel.recv(9999))
-
-            if re.search("TQL \[database=", data):
+                received = self._channel.recv(RemoteTQL.BUFFER_SIZE)
+                self._metrics["wire_bytes"] += len(received)
+                self._metrics["logical_bytes"] += len(received)
+                text = decoder.decode(received)
+                if too_large or result is not None:
+                    data = (data + text)[-RemoteTQL.PROMPT_WINDOW:]  # only need to find the prompt.
+                    continue
+
+                guard.add(text)
+                too_large = guard.exceeded()
+                data += text
+                lines += text.count("\n")
+                if row_limit is not None and lines >= row_limit + RemoteTQL.SHELL_HEADER_LINES:
+                    result = _truncate_lines(data, row_limit + RemoteTQL.SHELL_HEADER_LINES)
+                    data = data[len(result):]
+                    if not re.search(r"TQL \[database=", data):
+                        self._channel.send(RemoteTQL.INTERRUPT)  # don't need the rest.
+                        interrupted_at = time.time()
+
+            if re.search(r"TQL \[database=", data):
                 full_command = True
                 self._set_prompt(data=data)
-            elif re.search("\$> ", data):
+            elif re.search(r"\$> ", data):
                 self._set_prompt(partial=True)
                 partial_command = True
+            elif interrupted_at and time.time() - interrupted_at > RemoteTQL.INTERRUPT_TIMEOUT:
+                raise TQLError("TQL didn't return to the prompt after cancelling the statement.")
             else:
-                time.sleep(1)  # give it time to work.
+                select.select([self._channel], [], [], 1)  # give it time to work.
+
+        if interrupted_at:
+            self._drain_after_interrupt()
+        if too_large:
+            raise guard.error()
+        if result is not None:
+            data = result
 
-        data = data.replace("\\r", "")
-        data = data.split("\\n")
+        data = data.replace("\r", "")
+        data = data.split("\n")
         data = data[1:-1]  # first is the command, last is the prompt.
 
+        if result is None:
+            guard.rows = RemoteTQL._count_rows(data)  # not every statement has a row count line.
+            if guard.exceeded():
+                raise guard.error()
+
         return data
 
-    def execute_tql_query(self, query):
+    @staticmethod
+    def _count_rows(data):
         """
-        Executes a TQL query and returns the data as a data table.
+        Returns the number of rows in the output of a statement in the TQL shell.
+        :param data: The lines of output without the command and the prompt.
+        :type data: list of str
+        :return: The number of lines that aren't the header, the divider, the row count or a status message.
+        :rtype: int
+        """
+        if len(data) > 1 and data[1] and not data[1].strip("-+ "):
+            data = data[2:]  # skip the header and divider.
+        return sum(1 for line in data if not line.endswith("result rows)") and
+                   not line.startswith(TQL.STATUS_MESSAGES))
+
+    def _drain_after_interrupt(self):
+        """
+        Reads and discards everything up to the prompt that follows an interrupt.  If the statement had already
+        finished when the interrupt arrived, the prompt that was found is the statement's and the interrupt's echo
+        and prompt are still coming.  A marker is sent after the interrupt and everything up to the prompt after its
+        echo is discarded, so the next command only reads its own output.
+        :return: None
+        :raises: TQLError if TQL doesn't return to the prompt.
+        """
+        marker = f"{RemoteTQL.DRAIN_MARKER} {time.time()}"
+        self._channel.send(marker + "\n")
+        decoder = codecs.getincrementaldecoder("utf-8")("ignore")
+        data = ""
+        end = time.time() + RemoteTQL.INTERRUPT_TIMEOUT
+        while True:
+            while self._channel.recv_ready():
+                received = self._channel.recv(RemoteTQL.BUFFER_SIZE)
+                self._metrics["wire_bytes"] += len(received)
+                self._metrics["logical_bytes"] += len(received)
+                data += decoder.decode(received)
+
+            if marker in data:
+                after = data[data.rindex(marker) + len(marker):]
+                if re.search(r"TQL \[database=", after):
+                    self._set_prompt(data=after)
+                    return
+                if re.search(r"\$> ", after):
+                    # TQL took the marker as the start of a statement, so end it.
+                    marker = ";"
+                    data = ""
+                    self._channel.send(marker + "\n")
+                    continue
+
+            if time.time() > end:
+                raise TQLError("TQL didn't return to the prompt after cancelling the statement.")
+            select.select([self._channel], [], [], 1)  # give it time to work.
+
+    def _run_exec_command(self, command, max_rows=None, max_result_bytes=None):
+        """
+        Runs a command in exec mode.  Like the TQL shell, lines are collected until a statement ends with a semicolon.
+        :param command: The command or part of a command to run.
+        :type command: str
+        :param max_rows: The most rows to read before raising an error.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes to read before raising an error.
+        :type max_result_bytes: int
+        :return: The data from the command followed by any messages from TQL.
+        :rtype: list of str
+        """
+        self._partial_command += command.strip() + "\n"
+        if not self._partial_command.strip().endswith(";"):
+            if self._partial_command.strip():
+                self._set_prompt(partial=True)
+            else:
+                self._partial_command = ""
+            return []
+
+        command = self._partial_command
+        self._partial_command = ""
+        self._set_prompt(database=self.database or "none")
+        return super(RemoteTQL, self).run_tql_command(command, max_rows=max_rows, max_result_bytes=max_result_bytes)
+
+    def _execute_query(self, query, max_rows=None, max_result_bytes=None, row_limit=None):
+        """
+        Executes the query with a separate TQL process and returns the standard out and standard error.  Only used in
+        exec mode.
+        :param query: The query to execute.
+        :type query: str
+        :param max_rows: The most rows to read before raising an error.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes to read before raising an error.
+        :type max_result_bytes: int
+        :param row_limit: If set, only this many rows are returned and TQL is stopped once they have been read.
+        :type row_limit: int
+        :return: The results of the query.
+        :rtype list of str,str
+        :raises: TQLError, ResultTooLargeError
+        """
+        query = query.strip()
+
+        # make sure a semi-colon was included.
+        if not query.endswith(';'):
+            query += ";"
+
+        # Each process starts without a database, so switch to the one in use.
+        use_database = f"use {self.database};" if self.database else ""
+        logging.debug(use_database + query)
+
+        command = RemoteTQL.EXEC_COMMAND
+        if row_limit is not None:
+            command += f" {TQL.TOP_ROW_COUNT_FLAG}={row_limit}"  # the last flag wins.
+        decompressor = None
+        if self._compress:
+            # only the results are compressed, errors still come back as text.  pipefail keeps TQL's exit status.
+            command = "bash -o pipefail -c " + shlex.quote(command + " | " + RemoteTQL.COMPRESS_COMMAND)
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        guard = _ResultGuard(max_rows=max_rows, max_result_bytes=max_result_bytes)
+        channel = self.__ssh_client.get_transport().open_session()
+        try:
+            channel.exec_command(command)
+            channel.sendall((use_database + "\n" + query + "\n").encode("utf-8"))
+            channel.shutdown_write()
+            self._metrics["queries"] += 1  # counted once sent, see get_metrics().
+
+            out = bytearray()
+            err = bytearray()
+            stopped = False
+            while True:
+                if channel.recv_stderr_ready():
+                    err += channel.recv_stderr(RemoteTQL.BUFFER_SIZE)
+                elif channel.recv_ready():
+                    received = channel.recv(RemoteTQL.BUFFER_SIZE)
+                    self._metrics["wire_bytes"] += len(received)
+                    received = decompressor.decompress(received) if decompressor else received
+                    out += self._check_received(received, guard)
+                    if row_limit is not None and guard.rows >= row_limit:
+                        out = _truncate_lines(out, row_limit)
+                        stopped = True
+                        break  # closing the channel stops TQL.
+                elif channel.eof_received:
+                    break
+                else:
+                    select.select([channel], [], [], 1)  # wait for more data.
+
+            if stopped:
+                exit_status = 0  # TQL didn't get to finish.
+            else:
+                if decompressor:
+                    out += self._check_received(decompressor.flush(), guard)
+                exit_status = channel.recv_exit_status()
+        finally:
+            channel.close()
+
+        stdout = TQL._split_output(bytes(out))
+        stderr = TQL._split_output(bytes(err))
+        TQL._check_for_errors(stderr, exit_status=exit_status)
+
+        # Each command runs in a new process, so remember the database for the next one.
+        databases = re.findall(r"(?:^|;)\s*use\s+(\S+?)\s*;", query, re.IGNORECASE)
+        if databases:
+            self._set_prompt(database=databases[-1])
+
+        if use_database:
+            # drop the messages for switching databases.
+            stderr = [line for line in stderr if use_database not in line]
+            if stderr and stderr[0].startswith(TQL.STATUS_MESSAGES):
+                del stderr[0]
+
+        return stdout, stderr
+
+    def _check_received(self, received, guard):
+        """
+        Counts results received in exec mode and checks them against the limits.
+        :param received: The results, after decompression.
+        :type received: bytes
+        :param guard: The limits for the results.
+        :type guard: _ResultGuard
+        :return: The results.
+        :rtype: bytes
+        :raises: ResultTooLargeError if the results are larger than the limits.  Closing the channel stops TQL.
+        """
+        self._metrics["logical_bytes"] += len(received)
+        guard.add(received)
+        if guard.exceeded():
+            raise guard.error()
+        return received
+
+    def _query_rows(self, query, max_rows=None, max_result_bytes=None):
+        """
+        Executes a TQL query and returns the header and the parsed rows.
         :param query: A complete query to send to TQL.
         :type query: str
-        :return: A data table with the results.
+        :param max_rows: The most rows to read before raising an error.
+        :type max_rows: int
+        :param max_result_bytes: The most bytes to read before raising an error.
+        :type max_result_bytes: int
+        :return: The header and a generator of the rows, which are parsed as they are read.
+        :rtype: list of str, generator of list of str
+        :raises: ResultTooLargeError if the result is larger than the limits.
+        """
+        if self._exec_mode:
+            return super(RemoteTQL, self)._query_rows(query, max_rows=max_rows, max_result_bytes=max_result_bytes)
+
+        data = self.run_tql_command(query, max_rows=max_rows, max_result_bytes=max_result_bytes)
+
+        header = [h.strip() for h in data[0].split("|")]  # Header is first row.
+
+        def rows():
+            # First two lines are header, last line is status message, e.g. "Statement executed successfully. "
+            for row in data[2:-1]:
+                if not row.endswith("result rows)"):  # some statements list how many rows, some done.
+                    yield [r.strip() for r in row.split("|")]
+
+        return header, rows()
+
+    def head(self, query, n=10):
+        """
+        Executes a TQL query and returns only the first rows.  Once the rows have been read the statement is
+        cancelled, so previews of large tables are quick and the session can still be used.
+        :param query: A complete query to send to TQL.
+        :type query: str
+        :param n: The number of rows to return.
+        :type n: int
+        :return: A data table with up to n rows.
         :rtype: DataTable
         """
-        data = self.run_tql_command(query)
+        if self._exec_mode:
+            return super(RemoteTQL, self).head(query, n=n)
+
+        self._channel.send(query)
+        self._channel.send("\n")
+        self._metrics["queries"] += 1
+        data = self._get_tql_response(row_limit=n)
 
         header = [h.strip() for h in data[0].split("|")]  # Header is first row.
         table = DataTable(header=header)
 
-        # First two lines are header, last line is status message, e.g. "Statement executed successfully. "
-        data = data[2:-1]
-        for row in data:
-            if not row.endswith("result rows)"):  # some statements list how many rows, some done.
+        # The row count and status message are only there if there were no more than n rows.
+        for row in data[2:]:
+            if not row.endswith("result rows)") and not row.startswith(TQL.STATUS_MESSAGES) and \
+                    table.nbr_rows() < n:
                 row = [r.strip() for r in row.split("|")]
                 table.add_row(row=row)
 
@@ -296,6 +932,9 @@ class RemoteTQL(TQL):
         :return: A list of all the database commands.
         :rtype: list of str
         """
+        if self._exec_mode:
+            return super(RemoteTQL, self).get_databases()
+
         data = self.run_tql_command(command=TQL.SHOW_DATABASES)
 
         # Returns all tables plus the "Statement executed successfully." results.
@@ -0,0 +1,162 @@
+from collections import Counter
+
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+"""
+This module contains classes for finding the rows that changed between snapshots of a query result.
+"""
+
+
+class ResultDelta:
+    """
+    The rows that changed between two snapshots of a query result.
+    """
+
+    def __init__(self, header, inserted=None, deleted=None, changed=None):
+        """
+        Creates a new delta.
+        :param header: The names of the columns.
+        :type header: list of str
+        :param inserted: Rows that are new in the snapshot.
+        :type inserted: list of list
+        :param deleted: Rows that are no longer in the snapshot.
+        :type deleted: list of list
+        :param changed: Pairs of (old row, new row) for keyed rows whose values changed.
+        :type changed: list of (list, list)
+        """
+        self.header = header
+        self.inserted = inserted or []
+        self.deleted = deleted or []
+        self.changed = changed or []
+
+    def is_empty(self):
+        """
+        Returns True if nothing changed.
+        :return: True if there are no inserted, deleted or changed rows.
+        :rtype: bool
+        """
+        return not (self.inserted or self.deleted or self.changed)
+
+    def __repr__(self):
+        """
+        Returns a pretty version to show.
+        :return: A printable representation of the delta.
+        :rtype: str
+        """
+        return self.__str__()
+
+    def __str__(self):
+        """
+        Returns a pretty version to print.  Each row starts with + (inserted), - (deleted) or ~ (changed).
+        :return: A printable representation of the delta.
+        :rtype: str
+        """
+        lines = ["+ " + "|".join(row) for row in self.inserted]
+        lines.extend("- " + "|".join(row) for row in self.deleted)
+        lines.extend("~ " + "|".join(old) + " -> " + "|".join(new) for old, new in self.changed)
+        return "\n".join(lines)
+
+
+class ResultWatcher:
+    """
+    Compares each snapshot of a query result with the previous one.  Without a key, each snapshot is kept as a count
+    of each distinct row, so rows are compared by hash and count and a changed row shows up as a delete and an
+    insert.  With a key, the rows for each key are kept, and rows whose key is in both snapshots are reported as
+    changed.  Several rows can have the same key.
+    """
+
+    def __init__(self, key=None):
+        """
+        Creates a new watcher.
+        :param key: Names or indexes of the columns that identify a row.
+        :type key: list of str or int
+        """
+        self._key = key
+        self._header = None
+        self._previous = Counter()  # row -> count without a key, key -> Counter of rows with one.
+
+    def update(self, table):
+        """
+        Compares a new snapshot with the previous one.  The first snapshot is reported as all inserts.  If the
+        columns change, all of the previous rows are reported as deleted and all of the new rows as inserted.
+        :param table: The new snapshot.
+        :type table: DataTable
+        :return: The rows that changed.
+        :rtype: ResultDelta
+        """
+        header = table.get_header()
+        replaced = []
+        if header != self._header:
+            # the columns changed, so nothing can be matched.
+            replaced = self._previous_rows()
+            self._header = header
+            self._previous = Counter()
+
+        rows = (tuple(table.get_row(row_number).get_data()) for row_number in range(table.nbr_rows()))
+        if self._key:
+            key_indexes = [k if isinstance(k, int) else header.index(k) for k in self._key]
+            current = {}
+            for row in rows:
+                current.setdefault(tuple(row[i] for i in key_indexes), Counter())[row] += 1
+            delta = self._compare_keyed(header, current)
+        else:
+            current = Counter(rows)
+            delta = ResultDelta(header=header)
+            for row in (current - self._previous).elements():
+                delta.inserted.append(list(row))
+            for row in (self._previous - current).elements():
+                delta.deleted.append(list(row))
+
+        delta.deleted.extend(replaced)
+        self._previous = current
+        return delta
+
+    def _previous_rows(self):
+        """
+        Returns all of the rows in the previous snapshot.
+        :return: The rows.
+        :rtype: list of list
+        """
+        if self._key:
+            return [list(row) for rows in self._previous.values() for row in rows.elements()]
+        return [list(row) for row in self._previous.elements()]
+
+    def _compare_keyed(self, header, current):
+        """
+        Compares the rows for each key.  Rows that were removed and added for the same key are paired up as changes.
+        :param header: The names of the columns.
+        :type header: list of str
+        :param current: Counter of rows for each key in the new snapshot.
+        :type current: dict
+        :return: The rows that changed.
+        :rtype: ResultDelta
+        """
+        delta = ResultDelta(header=header)
+        for row_key, rows in current.items():
+            previous = self._previous.get(row_key, Counter())
+            if rows == previous:
+                continue
+            added = list((rows - previous).elements())
+            removed = list((previous - rows).elements())
+            pairs = min(len(added), len(removed))
+            delta.changed.extend((list(old), list(new)) for old, new in zip(removed[:pairs], added[:pairs]))
+            delta.inserted.extend(list(row) for row in added[pairs:])
+            delta.deleted.extend(list(row) for row in removed[pairs:])
+
+        for row_key, rows in self._previous.items():
+            if row_key not in current:
+                delta.deleted.extend(list(row) for row in rows.elements())
+
+        return delta
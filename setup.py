@@ -13,5 +13,10 @@ setup(
     packages=find_packages(exclude=('tests', 'docs')),
     install_requires=[
         'paramiko'
-    ]
+    ],
+    entry_points={
+        'console_scripts': [
+            'rtql-bench=tql.rtql_bench:main',
+        ],
+    }
 )
@@ -13,15 +13,21 @@ TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR TH
 """
 
 import argparse
+import contextlib
+import os
 import select
 import socket
 import subprocess
 import sys
+import time
 import paramiko
 
-from pytql.tql import eprint, RemoteTQL
+from pytql.daemon import DEFAULT_SOCKET, DaemonError, DaemonTQL, start_daemon
+from pytql.render import write_lines
+from pytql.tql import eprint, RemoteTQL, TQLError
 
 VERSION = "2.0"
+DEFAULT_PAGER = "less -FRX"  # quits if the output fits on one screen and leaves it on the screen.
 
 
 def main():
@@ -31,19 +37,27 @@ def main():
     hostname = args.hostname
 
     try:
-        rtql = RemoteTQL(hostname=hostname, username=args.username, password=args.password)
+        if args.daemon:
+            start_daemon(socket_path=args.socket)
+            rtql = DaemonTQL(hostname=hostname, username=args.username, password=args.password,
+                             socket_path=args.socket)
+        else:
+            rtql = RemoteTQL(hostname=hostname, username=args.username, password=args.password,
+                             exec_mode=args.exec_mode, compress=args.compress)
 
         # This probably only works on Unix systems.  TODO add ability to detect Windows and not allow streaming.
         i, o, e = select.select([sys.stdin], [], [], 1)
         if i:
             stream_commands(rtql)
         else:
-            interactive_mode(rtql)
+            interactive_mode(rtql, pager=not args.no_pager)
 
     except socket.timeout as t:
         eprint(f"Timeout connecting to {hostname}")
     except paramiko.ssh_exception.AuthenticationException:
         eprint(f"Failed to login as {args.username} on {hostname}")
+    except DaemonError as de:
+        eprint(de)
 
 
 def parse_args():
@@ -54,6 +68,15 @@ def parse_args():
     parser.add_argument("hostname", help="IP or host name for ThoughtSpot")
     parser.add_argument("--username", default="admin", help="username for accessing ThoughtSpot from CLI")
     parser.add_argument("--password", default="th0ughtSp0t", help="password for accessing ThoughtSpot from CLI")
+    parser.add_argument("--daemon", action="store_true",
+                        help="use a session kept open by the rtql daemon, starting the daemon if needed")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket for the rtql daemon")
+    parser.add_argument("--exec", dest="exec_mode", action="store_true",
+                        help="run each command in a separate non-interactive TQL process")
+    parser.add_argument("--compress", action="store_true",
+                        help="compress data sent over SSH, and results on the server when used with --exec")
+    parser.add_argument("--no-pager", action="store_true",
+                        help="don't send results to $PAGER (default less -FRX) in interactive mode")
 
     args = parser.parse_args()
     return args
@@ -67,15 +90,16 @@ def stream_commands(rtql):
     :return: None
     """
     for command in sys.stdin:
-        results = rtql.run_tql_command(command=command)
-        print("\n".join(results))
+        run_tql_command(rtql=rtql, command=command)
 
 
-def interactive_mode(rtql):
+def interactive_mode(rtql, pager=True):
     """
     Runs in interactive mode, prompting users for input.
     :param rtql: The remote TQL object for sending commands.
     :type rtql: RemoteTQL
+    :param pager: If True, results are shown in a pager when writing to a terminal.
+    :type pager: bool
     :return: None
     """
     print(f"Starting RTQL version {VERSION}")
@@ -89,13 +113,63 @@ def interactive_mode(rtql):
             run_shell_command(rtql=rtql, command=command)
         elif command.lower().startswith("writedb"):
             write_db_to_file(rtql=rtql, command=command)
+        elif command.lower().startswith("watch"):
+            watch_query(rtql=rtql, command=command)
         else:
-            results = rtql.run_tql_command(command=command)
-            print("\n".join(results))
+            run_tql_command(rtql=rtql, command=command, pager=pager)
 
         command = input(rtql.prompt)
 
 
+def run_tql_command(rtql, command, pager=False):
+    """
+    Runs a TQL command and prints the results.
+    :param rtql: Remote TQL object.
+    :type rtql: RemoteTQL
+    :param command: The command to run.
+    :type command: str
+    :param pager: If True, the results are shown in a pager when writing to a terminal.
+    :type pager: bool
+    :return: None
+    """
+    try:
+        results = rtql.run_tql_command(command=command)
+        if results:
+            with open_output(pager=pager) as out:
+                write_lines(results, out)
+    except TQLError as te:
+        eprint(te)
+
+
+@contextlib.contextmanager
+def open_output(pager=False):
+    """
+    Opens the output for results.  This is a pager if requested and writing to a terminal, otherwise stdout.  The
+    pager shows the first screen as soon as it's written, rather than after everything has scrolled past.
+    :param pager: If True, use the pager from $PAGER, or less -FRX.
+    :type pager: bool
+    :return: A file object to write the results to.
+    """
+    if not pager or not sys.stdout.isatty():
+        yield sys.stdout
+        sys.stdout.flush()
+        return
+
+    sys.stdout.flush()  # anything already printed needs to come before the pager output.
+    proc = subprocess.Popen(os.environ.get("PAGER") or DEFAULT_PAGER, shell=True, stdin=subprocess.PIPE,
+                            universal_newlines=True)
+    try:
+        yield proc.stdin
+    except BrokenPipeError:
+        pass  # the user quit the pager before seeing everything.
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        proc.wait()
+
+
 def read_from_file(rtql, command):
     """
     Reads input from a file.
@@ -113,8 +187,7 @@ def read_from_file(rtql, command):
         try:
             with open(filename, "r") as commands:
                 for command in commands:
-                    results = rtql.run_tql_command(command=command)
-                    print("\n".join(results))
+                    run_tql_command(rtql=rtql, command=command)
         except FileNotFoundError as fnfe:
             eprint(f"{filename}: {fnfe.strerror}")
 
@@ -158,5 +231,38 @@ def write_db_to_file(rtql, command):
                 dbfile.write(line + "\n")
 
 
+def watch_query(rtql, command):
+    """
+    Runs a query every few seconds and prints the rows that changed until interrupted.  Expects the interval in
+    seconds and the query.
+    :param rtql: Remote TQL object.
+    :type rtql: RemoteTQL
+    :param command: The command from input.
+    :type command: str
+    :return: None
+    """
+    tokens = command.split(" ", 2)
+
+    if len(tokens) < 3:
+        eprint("usage:  watch <seconds> <query>")
+        return
+
+    try:
+        interval = float(tokens[1])
+    except ValueError:
+        eprint("usage:  watch <seconds> <query>")
+        return
+
+    try:
+        for delta in rtql.watch(query=tokens[2], interval=interval):
+            print(f"--- {time.strftime('%H:%M:%S')} ---")
+            if not delta.is_empty():
+                print(delta)
+    except TQLError as te:
+        eprint(te)
+    except KeyboardInterrupt:
+        print()  # back to the prompt.
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import argparse
+import socket
+import paramiko
+
+from pytql.bench import read_statements, replay
+from pytql.tql import eprint, RemoteTQL, TQL
+
+
+def main():
+    """Replays a TQL workload against a cluster and reports how it performed."""
+
+    args = parse_args()
+
+    with open(args.script, "r") as script:
+        statements = read_statements(script)
+    if not statements:
+        eprint(f"No statements found in {args.script}")
+        return
+
+    if args.tql_command:
+        TQL.COMMAND = args.tql_command
+        RemoteTQL.EXEC_COMMAND = args.tql_command
+
+    if args.local:
+        session_factory = TQL
+    else:
+        def session_factory():
+            return RemoteTQL(hostname=args.hostname, username=args.username, password=args.password,
+                             exec_mode=args.exec_mode, compress=args.compress)
+
+    try:
+        results = replay(statements, session_factory, sessions=args.sessions, rate=args.rate, repeat=args.repeat)
+    except socket.timeout:
+        eprint(f"Timeout connecting to {args.hostname}")
+        return
+    except paramiko.ssh_exception.AuthenticationException:
+        eprint(f"Failed to login as {args.username} on {args.hostname}")
+        return
+
+    print_summary(results.get_summary())
+
+
+def parse_args():
+
+    """Parses the arguments from the command line."""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("script", help="file with the statements to run, or a log of an rtql or TQL session")
+    parser.add_argument("--hostname", help="IP or host name for ThoughtSpot")
+    parser.add_argument("--username", default="admin", help="username for accessing ThoughtSpot from CLI")
+    parser.add_argument("--password", default="th0ughtSp0t", help="password for accessing ThoughtSpot from CLI")
+    parser.add_argument("--local", action="store_true", help="run TQL locally instead of connecting to a host")
+    parser.add_argument("--tql-command", help="command to run instead of TQL, e.g. a stand-in for testing")
+    parser.add_argument("--exec", dest="exec_mode", action="store_true",
+                        help="run each statement in a separate non-interactive TQL process")
+    parser.add_argument("--compress", action="store_true",
+                        help="compress data sent over SSH, and results on the server when used with --exec")
+    parser.add_argument("--sessions", type=int, default=1, help="number of concurrent sessions")
+    parser.add_argument("--rate", type=float, help="target statements per second across all sessions")
+    parser.add_argument("--repeat", type=int, default=1, help="number of times each session runs the script")
+
+    args = parser.parse_args()
+    if not args.local and not args.hostname:
+        parser.error("either --hostname or --local is required")
+    return args
+
+
+def print_summary(summary):
+    """
+    Prints the results for each type of statement, with all statements last.
+    :param summary: The summary from the benchmark results.
+    :type summary: dict of str to dict
+    """
+    print(f"{'statement':<12}{'count':>8}{'errors':>8}{'error %':>9}{'stmt/s':>9}"
+          f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for key in sorted(summary, key=lambda k: (k == "ALL", k)):
+        stats = summary[key]
+        print(f"{key:<12}{stats['count']:>8}{stats['errors']:>8}{stats['error_rate'] * 100:>9.1f}"
+              f"{stats['throughput']:>9.1f}{stats['p50'] * 1000:>10.1f}{stats['p90'] * 1000:>10.1f}"
+              f"{stats['p99'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Copyright 2019 ThoughtSpot
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import argparse
+import json
+
+from pytql.daemon import DEFAULT_KEEPALIVE, DEFAULT_SOCKET, DaemonError, TQLDaemon, connect_to_daemon, is_running
+from pytql.tql import eprint
+
+
+def main():
+    """Runs the daemon that keeps remote TQL sessions open for rtql."""
+
+    args = parse_args()
+
+    if args.status or args.stop:
+        if not is_running(args.socket):
+            eprint(f"No daemon running on {args.socket}")
+            return
+        try:
+            response = send_request(args.socket, {"action": "status" if args.status else "shutdown"})
+        except DaemonError as de:
+            eprint(de)
+            return
+        if args.status:
+            for session in response["sessions"]:
+                print(f"{session['username']}@{session['hostname']} [database={session['database']}] "
+                      f"{'active' if session['active'] else 'inactive'}")
+        return
+
+    try:
+        TQLDaemon(socket_path=args.socket, keepalive=args.keepalive).serve_forever()
+    except DaemonError as de:
+        eprint(de)
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_args():
+
+    """Parses the arguments from the command line."""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to listen on")
+    parser.add_argument("--keepalive", type=int, default=DEFAULT_KEEPALIVE,
+                        help="seconds between keepalives sent to each host")
+    parser.add_argument("--status", action="store_true", help="list the sessions of the running daemon")
+    parser.add_argument("--stop", action="store_true", help="stop the running daemon")
+
+    args = parser.parse_args()
+    return args
+
+
+def send_request(socket_path, request):
+    """
+    Sends a single request to the running daemon.
+    :param socket_path: The Unix socket for the daemon.
+    :type socket_path: str
+    :param request: The request to send.
+    :type request: dict
+    :return: The response from the daemon.
+    :rtype: dict
+    :raises: DaemonError if the daemon is run by another user.
+    """
+    with connect_to_daemon(socket_path) as sock:
+        with sock.makefile("rwb") as sockfile:
+            sockfile.write(json.dumps(request).encode("utf-8") + b"\n")
+            sockfile.flush()
+            return json.loads(sockfile.readline().decode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()